@@ -0,0 +1,200 @@
+"""Read and write feature tables as TSVs or binary feature stores.
+
+A feature store is a directory with the extension .fstore. It contains the feature values as a memory-mappable float64
+matrix (values.npy), each index level as an array (index0.npy, ...), and the index names and column dtypes as text.
+"""
+
+import numpy as np
+import os
+import pandas as pd
+import re
+import shutil
+
+store_ext = '.fstore'
+
+
+def is_store(path):
+    return path.rstrip('/').endswith(store_ext)
+
+
+def find_features(stem):
+    """Return path to feature store with stem if it exists and path to TSV otherwise."""
+    return stem + store_ext if os.path.exists(stem + store_ext) else stem + '.tsv'
+
+
+def feature_paths(feature_dir):
+    """Return names of numbered feature tables in either format in a directory."""
+    return filter(lambda x: re.match(r'features_[0-9]+(\.tsv|\.fstore)$', x), os.listdir(feature_dir))
+
+
+def index_array(level):
+    """Return index level as array which can be saved without pickling."""
+    array = level.to_numpy()
+    return array.astype(str) if array.dtype == object else array
+
+
+def infer_level(array):
+    """Return array of strings converted to bool or numeric type if possible as read_csv would for the full column."""
+    if np.isin(array, ['True', 'False']).all():
+        return array == 'True'
+    try:
+        return pd.to_numeric(array)
+    except ValueError:
+        return array
+
+
+def write_meta(path, index_names, columns, dtypes):
+    with open(os.path.join(path, 'index.txt'), 'w') as file:
+        for name in index_names:
+            file.write(f'{name}\n')
+    with open(os.path.join(path, 'columns.tsv'), 'w') as file:
+        for column, dtype in zip(columns, dtypes):
+            file.write(f'{column}\t{dtype}\n')
+
+
+def replace_dir(tmp_path, path):
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+def write_features(df, path):
+    """Write feature dataframe to TSV or feature store depending on the extension of path."""
+    if not is_store(path):
+        df.to_csv(path, sep='\t')
+        return
+
+    tmp_path = path.rstrip('/') + '.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, 'values.npy'), df.to_numpy(dtype=np.float64))
+    for k in range(df.index.nlevels):
+        np.save(os.path.join(tmp_path, f'index{k}.npy'), index_array(df.index.get_level_values(k)))
+    write_meta(tmp_path, df.index.names, df.columns, df.dtypes)
+    replace_dir(tmp_path, path)
+
+
+def tsvs_to_store(paths, path, num_idx, empty):
+    """Write feature TSVs with identical columns to a single feature store without loading them together.
+
+    If there are no TSVs, the empty dataframe is written, so the store has its index names and columns.
+    """
+    paths = list(paths)
+    if not paths:
+        write_features(empty, path)
+        return
+
+    num_rows = 0
+    for tsv_path in paths:
+        with open(tsv_path) as file:
+            num_rows += sum(1 for _ in file) - 1  # Subtract header
+
+    tmp_path = path.rstrip('/') + '.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+    values, levels, dtypes = None, [], []
+    row = 0
+    for tsv_path in paths:
+        df = pd.read_csv(tsv_path, sep='\t', index_col=list(range(num_idx)), dtype={k: str for k in range(num_idx)})
+        if values is None:
+            values = np.lib.format.open_memmap(os.path.join(tmp_path, 'values.npy'), mode='w+',
+                                               dtype=np.float64, shape=(num_rows, df.shape[1]))
+            index_names, columns = df.index.names, df.columns
+        values[row:row + len(df)] = df.to_numpy(dtype=np.float64)
+        levels.append([index_array(df.index.get_level_values(k)) for k in range(num_idx)])
+        dtypes.append(df.dtypes)
+        row += len(df)
+    values.flush()
+
+    # Infer index types over all chunks since a single chunk may not be representative
+    for k in range(num_idx):
+        level = infer_level(np.concatenate([chunk_levels[k] for chunk_levels in levels]))
+        np.save(os.path.join(tmp_path, f'index{k}.npy'), index_array(pd.Index(level)))
+    dtypes = [np.result_type(*column_dtypes) for column_dtypes in zip(*dtypes)]
+    write_meta(tmp_path, index_names, columns, dtypes)
+    replace_dir(tmp_path, path)
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'index.txt')) as file:
+        index_names = [line.rstrip('\n') for line in file]
+    with open(os.path.join(path, 'columns.tsv')) as file:
+        columns, dtypes = zip(*[line.rstrip('\n').split('\t') for line in file])
+    return index_names, list(columns), dtypes
+
+
+def read_store(path, rows=None, mmap=True):
+    """Return feature dataframe from feature store, reading only the given row offsets if rows is not None."""
+    index_names, columns, dtypes = read_meta(path)
+    levels = [np.load(os.path.join(path, f'index{k}.npy'), mmap_mode='r') for k in range(len(index_names))]
+    values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r' if mmap else None)
+    if rows is not None:
+        levels = [level[rows] for level in levels]
+        values = values[rows]
+    else:
+        levels = [np.asarray(level) for level in levels]
+
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name=index_names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=index_names)
+    df = pd.DataFrame(values, index=index, columns=columns)
+    return df.astype({column: dtype for column, dtype in zip(columns, dtypes) if dtype != 'float64'})
+
+
+def read_features(path, num_idx, mmap=True):
+    """Return feature dataframe from TSV or feature store depending on the extension of path."""
+    if not is_store(path):
+        return pd.read_csv(path, sep='\t', index_col=list(range(num_idx)))
+    return read_store(path, mmap=mmap)
+
+
+def iter_features(path, num_idx, chunksize):
+    """Yield feature dataframes of at most chunksize rows from TSV or feature store without loading the full table."""
+    if not is_store(path):
+        yield from pd.read_csv(path, sep='\t', index_col=list(range(num_idx)), chunksize=chunksize)
+        return
+
+    num_rows = len(np.load(os.path.join(path, 'values.npy'), mmap_mode='r'))
+    for start in range(0, num_rows, chunksize):
+        yield read_store(path, np.arange(start, min(start + chunksize, num_rows)))
+
+
+def key_index(path, name):
+    """Return sorted keys of index level name and the corresponding row offsets in a feature store.
+
+    The index is saved in the store on first use, so later lookups only load the keys and offsets. Keys are compared
+    as strings to match the index regardless of the type inferred for the level.
+    """
+    keys_path = os.path.join(path, f'{name}_keys.npy')
+    rows_path = os.path.join(path, f'{name}_rows.npy')
+    if os.path.exists(keys_path) and os.path.exists(rows_path):
+        return np.load(keys_path, mmap_mode='r'), np.load(rows_path, mmap_mode='r')
+
+    index_names, _, _ = read_meta(path)
+    level = np.load(os.path.join(path, f'index{index_names.index(name)}.npy')).astype(str)
+    rows = np.argsort(level, kind='stable')
+    keys = level[rows]
+    for array_path, array in [(keys_path, keys), (rows_path, rows)]:
+        with open(array_path + '.tmp', 'wb') as file:  # Prevent concurrent readers from loading a partial index
+            np.save(file, array)
+        os.replace(array_path + '.tmp', array_path)
+    return keys, rows
+
+
+def read_keys(path, num_idx, name, keys):
+    """Return rows of feature dataframe whose index level name is in keys in their original order.
+
+    Feature stores are accessed through the persistent index on the level, so only the matching rows are read. path may
+    also be a loaded feature dataframe, so TSVs which are looked up repeatedly are only read once.
+    """
+    if isinstance(path, pd.DataFrame):
+        return path.loc[path.index.get_level_values(name).isin(keys), :]
+    if not is_store(path):
+        return read_keys(read_features(path, num_idx), num_idx, name, keys)
+
+    sorted_keys, sorted_rows = key_index(path, name)
+    keys = np.unique(np.asarray(keys).astype(str))
+    lefts = np.searchsorted(sorted_keys, keys, side='left')
+    rights = np.searchsorted(sorted_keys, keys, side='right')
+    rows = [sorted_rows[left:right] for left, right in zip(lefts, rights)]
+    rows = np.sort(np.concatenate(rows + [np.empty(0, dtype=np.int64)]))
+    return read_store(path, rows)
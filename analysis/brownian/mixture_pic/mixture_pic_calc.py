@@ -1,14 +1,15 @@
 """Fit Laplace and Gaussian mixtures mixture models to PIC distributions after removing zeroes."""
 
-import multiprocessing as mp
 import numpy as np
 import os
 import pandas as pd
+import pools
 import json
 import scipy.stats as stats
 from pymix.estimate import cfes
 from pymix.mixture import MixtureModel
 from random import random
+from sys import argv
 
 
 def get_rand_params(rand_maxes):
@@ -69,7 +70,7 @@ def fit_model(pics_lt, feature, model):
 
 # Input variables
 path = '../pic_calc/pics.tsv'
-num_processes = int(os.environ['SLURM_NTASKS'])
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 num_init = 10  # Number of initializations for each model
 num_std = 20  # Number of standard deviations above mean for max of the random initials
 models = [('norm4', [stats.norm, stats.norm, stats.norm, stats.norm]),
@@ -87,8 +88,8 @@ if __name__ == '__main__':  # Multiprocessing can only occur in top-level script
                    (~pics.index.get_level_values('ordered').array.astype(bool))]
     featmods = [(pics_lt, feature, model) for feature in pics_lt for model in models]
 
-    with mp.Pool(processes=num_processes) as pool:
-        pool.starmap(fit_model, featmods)
+    with pools.Pool(pool_mode, num_workers) as pool:
+        pools.pool_map(pool, fit_model, featmods, num_workers, star=True)
 
 """
 DEPENDENCIES
@@ -1,14 +1,15 @@
 """Fit mixture models to rate distributions."""
 
-import multiprocessing as mp
 import numpy as np
 import os
 import pandas as pd
+import pools
 import json
 import scipy.stats as stats
 from pymix.estimate import cfes
 from pymix.mixture import MixtureModel
 from random import random
+from sys import argv
 
 
 def get_rand_params(rand_maxes):
@@ -70,7 +71,7 @@ def fit_model(rates, feature, model):
 # Input variables
 path = '../mixture_filter/out/rates_filter.tsv'
 lt = 32
-num_processes = int(os.environ['SLURM_NTASKS'])
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 num_init = 10  # Number of initializations for each model
 num_std = 10  # Number of standard deviations above mean for max of the random initials
 models = [('lognorm3', [stats.lognorm, stats.lognorm, stats.lognorm]),
@@ -85,8 +86,8 @@ if __name__ == '__main__':  # Multiprocessing can only occur in top-level script
     rates = pd.read_csv(path, sep='\t', index_col=0).dropna()
     featmods = [(rates, feature, model) for feature in rates for model in models]
 
-    with mp.Pool(processes=num_processes) as pool:
-        pool.starmap(fit_model, featmods)
+    with pools.Pool(pool_mode, num_workers) as pool:
+        pools.pool_map(pool, fit_model, featmods, num_workers, star=True)
 
 """
 DEPENDENCIES
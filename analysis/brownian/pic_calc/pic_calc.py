@@ -1,10 +1,11 @@
 """Calculate phylogenetic contrasts from features."""
 
 import Bio.Phylo as Phylo
-import multiprocessing as mp
+import featstore
 import pandas as pd
+import pools
 from copy import deepcopy
-from os import environ
+from sys import argv
 
 
 def get_contrasts(node, results):
@@ -55,9 +56,9 @@ def block_contrasts(grouptree):
 
 
 # Input variables
-path_features = '../feature_calc/features.tsv'
+path_features = featstore.find_features('../feature_calc/features')  # Feature store if present, otherwise TSV
 path_tree = '../prune_tree_25/out/drosophila-10spec-tree.nwk'
-num_processes = int(environ['SLURM_NTASKS'])
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 taxon_ids = {'ananassae': 7217,
              'erecta': 7220,
              'grimshawi': 7222,
@@ -71,14 +72,14 @@ taxon_ids = {'ananassae': 7217,
 
 if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
     # Load data
-    features = pd.read_csv(path_features, sep='\t', index_col=list(range(5)))
+    features = featstore.read_features(path_features, 5)
     tree = Phylo.read(path_tree, 'newick')
 
     # Compute PICs for each block
     groups = [group for group in features.groupby(level='block_id') if len(group[1]) == 10]  # Second item in tuple is df
     trees = [deepcopy(tree) for i in range(len(groups))]  # Deepcopy necessary due to nested structure of trees
-    with mp.Pool(processes=num_processes) as pool:
-        blocks_pics = pool.imap(block_contrasts, zip(groups, trees), chunksize=50)  # Dataframe of PICs for each block
+    with pools.Pool(pool_mode, num_workers) as pool:
+        blocks_pics = pools.pool_map(pool, block_contrasts, zip(groups, trees), num_workers)  # Dataframe of PICs for each block
         pics = pd.concat(blocks_pics)
 
     # Concatenate block dataframes and save
@@ -86,10 +87,10 @@ if __name__ == '__main__':  # Multiprocessing can only occur in top-level script
 
 """
 NOTES
-The somewhat awkward zipping of the group and trees lists is due to a limitation of groupby and mp.Pool
+The somewhat awkward zipping of the group and trees lists is due to a limitation of groupby and multiprocessing pools
     It is possible to filter groups with a built-in method, which is likely more efficient, but the filtration combines the data again, which would force a second round of grouping.
     Ideally, the code would pass the groups and the block_contrasts function would instantiate a new tree as needed.
-        However, mp.Pool cannot parallelize functions which are not defined at initialization.
+        However, multiprocessing pools cannot parallelize functions which are not defined at initialization.
         Thus, I cannot create a block_contrasts factory function which can include the tree in the enclosing scope.
             The options are either to pass the tree as a argument or make block_contrasts dependent on the global environment.
 
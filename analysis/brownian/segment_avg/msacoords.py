@@ -0,0 +1,33 @@
+"""Map between gapped alignment columns and ungapped residue positions of aligned sequences."""
+
+import numpy as np
+
+
+def gap_mask(seqs, gap='-'):
+    """Return boolean matrix which is True at gaps in aligned sequences of equal length."""
+    seqs = list(seqs)
+    array = np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)
+    return array.reshape(len(seqs), -1) == ord(gap)
+
+
+def ungapped_index(mask):
+    """Return matrix of the ungapped position of the residue in each column of each sequence with -1 at gaps."""
+    idx = np.cumsum(~mask, axis=1) - 1
+    idx[mask] = -1
+    return idx
+
+
+def gapped_index(mask):
+    """Return list of arrays of the column of each residue of each sequence."""
+    return [np.flatnonzero(~row) for row in mask]
+
+
+def project(mask, values, fill=-1):
+    """Return matrix of per-residue values of each sequence placed in their alignment columns with fill at gaps.
+
+    Residues in row-major order of the alignment are the residues of the ungapped sequences in order, so the values
+    are placed with a single boolean index of the concatenated values.
+    """
+    matrix = np.full(mask.shape, fill, dtype=np.float64)
+    matrix[~mask] = np.concatenate(values) if len(values) > 0 else []
+    return matrix
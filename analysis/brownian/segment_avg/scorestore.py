@@ -0,0 +1,113 @@
+"""Store of per-residue scores keyed on the hash of the ungapped sequence and scoring method.
+
+A score store is a directory with the extension .sstore. It contains the scores of all sequences concatenated as a
+memory-mappable float32 file (scores.f32) and an index with the key, offset, and length of each sequence (index.tsv).
+Both files are only appended to, so sequences scored by one script are available to all later scripts. Scripts may
+run at the same time, so appends hold an exclusive lock on the store from reading the offset to writing the index.
+"""
+
+import fcntl
+import hashlib
+import numpy as np
+import os
+from contextlib import contextmanager
+
+
+def seq_key(seq, version):
+    return hashlib.sha1(f'{version}:{seq}'.encode('ascii')).hexdigest()
+
+
+class ScoreStore:
+    """Read scores from a score store and append the scores of sequences not in it."""
+
+    def __init__(self, path, version):
+        os.makedirs(path, exist_ok=True)
+        self.scores_path = os.path.join(path, 'scores.f32')
+        self.index_path = os.path.join(path, 'index.tsv')
+        self.lock_path = os.path.join(path, 'lock')
+        self.version = str(version)
+        self.index = {}
+        self.index_size = 0  # Bytes of index already read
+        self.scores = None
+        self.hits = 0
+        self.misses = 0
+
+        with self.lock(fcntl.LOCK_SH):  # Prevent reading partially written index lines
+            self.index, self.index_size = self.read_index()
+        self.load()
+
+    @contextmanager
+    def lock(self, operation):
+        with open(self.lock_path, 'a') as file:
+            fcntl.flock(file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def read_index(self):
+        """Return copy of index with entries appended since it was last read and the size of the index file read."""
+        index = dict(self.index)
+        if not os.path.exists(self.index_path):
+            return index, self.index_size
+        with open(self.index_path, 'rb') as file:
+            file.seek(self.index_size)
+            data = file.read()
+        for line in data.decode('ascii').splitlines():
+            key, offset, length = line.split()
+            index[key] = (int(offset), int(length))
+        return index, self.index_size + len(data)
+
+    def load(self):
+        """Memory-map the scores file, which must be mapped again after appending."""
+        if os.path.exists(self.scores_path) and os.path.getsize(self.scores_path) > 0:
+            self.scores = np.memmap(self.scores_path, dtype=np.float32, mode='r')
+
+    def read(self, key):
+        offset, length = self.index[key]
+        return self.scores[offset:offset + length] if length > 0 else np.empty(0, dtype=np.float32)
+
+    def put(self, scores):
+        """Append dictionary of key: scores of sequences, skipping keys already in the store."""
+        if not any(key not in self.index for key in scores):
+            return
+        with self.lock(fcntl.LOCK_EX):
+            index, _ = self.read_index()  # Include sequences added by other scripts since the index was read
+            scores = {key: array for key, array in scores.items() if key not in index}
+            offset = os.path.getsize(self.scores_path) // 4 if os.path.exists(self.scores_path) else 0
+            lines = []
+            with open(self.scores_path, 'ab') as file:
+                for key, array in scores.items():
+                    file.write(np.asarray(array, dtype=np.float32).tobytes())
+                    lines.append(f'{key}\t{offset}\t{len(array)}\n')
+                    offset += len(array)
+            with open(self.index_path, 'a') as file:  # Index is written after scores, so indexed scores are complete
+                file.writelines(lines)
+            index, index_size = self.read_index()
+
+        # Map new scores before replacing the index, since threads may read any key in the index
+        self.load()
+        self.index, self.index_size = index, index_size
+
+    def score(self, seqs, score_batch):
+        """Return list of score arrays of seqs and dictionary of key: scores of sequences not in the store.
+
+        Missing scores are calculated with score_batch but not added, so workers can score sequences with a snapshot
+        of the store while a single process adds them with put.
+        """
+        seqs = list(seqs)
+        keys = [seq_key(seq, self.version) for seq in seqs]
+        missing = {key: seq for key, seq in zip(keys, seqs) if key not in self.index}
+        self.hits += len(seqs) - len(missing)
+        self.misses += len(missing)
+        new = {}
+        if missing:
+            arrays = score_batch(list(missing.values()))
+            new = {key: np.asarray(array, dtype=np.float32) for key, array in zip(missing, arrays)}  # As if stored
+        return [new[key] if key in new else self.read(key) for key in keys], new
+
+    def get(self, seqs, score_batch):
+        """Return list of score arrays of seqs, calculating and adding scores of sequences not in the store."""
+        arrays, new = self.score(seqs, score_batch)
+        self.put(new)
+        return arrays
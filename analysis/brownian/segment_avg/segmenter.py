@@ -0,0 +1,72 @@
+"""Segment score vectors into runs of positions below or above a threshold."""
+
+import numpy as np
+
+
+def label_batch(scores_list, thresh, hysteresis=0, above=False):
+    """Return concatenated boolean labels of positions in score vectors and the start offset of each vector.
+
+    Positions are labeled True if their score is below thresh (or above thresh if above is True). With hysteresis,
+    the label only changes to True at scores below thresh - hysteresis and to False at scores not below
+    thresh + hysteresis, and otherwise continues the label of the previous position. The first position of each vector
+    is labeled with thresh alone.
+    """
+    scores_list = [np.asarray(scores, dtype=np.float64) for scores in scores_list]
+    offsets = np.zeros(len(scores_list) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(scores) for scores in scores_list])
+    scores = np.concatenate(scores_list) if scores_list else np.empty(0)
+    if above:  # Flip signs so only the below case is needed
+        scores, thresh = -scores, -thresh
+
+    on = scores < thresh - hysteresis
+    off = ~(scores < thresh + hysteresis)  # NaN scores are labeled False as with thresh alone
+    starts = offsets[:-1][offsets[:-1] < offsets[1:]]  # Starts of non-empty vectors
+    on[starts] = scores[starts] < thresh
+    off[starts] = ~on[starts]
+
+    # Forward fill labels from the last position where the label was set
+    last = np.where(on | off, np.arange(len(scores)), 0)
+    last = np.maximum.accumulate(last) if len(last) > 0 else last
+    return on[last], offsets
+
+
+def merge_short(labels, min_length):
+    """Return labels where runs shorter than min_length are flipped into their neighbors, shortest first."""
+    labels = labels.copy()
+    while True:
+        starts, stops = run_bounds(labels)
+        lengths = stops - starts
+        if len(lengths) < 2 or lengths.min() >= min_length:
+            return labels
+        i = np.argmin(lengths)
+        labels[starts[i]:stops[i]] = ~labels[starts[i]]
+
+
+def run_bounds(labels):
+    """Return arrays of start and stop of each run of equal labels."""
+    changes = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate([[0], changes])
+    stops = np.concatenate([changes, [len(labels)]])
+    return starts, stops
+
+
+def find_bounds(labels, min_length=1):
+    """Return list of (start, stop), label for each run of equal labels in boolean vector."""
+    labels = np.asarray(labels, dtype=bool)
+    if len(labels) == 0:
+        return []
+    if min_length > 1:
+        labels = merge_short(labels, min_length)
+    starts, stops = run_bounds(labels)
+    return [((start, stop), label) for start, stop, label in zip(starts.tolist(), stops.tolist(), labels[starts].tolist())]
+
+
+def segment_batch(scores_list, thresh, hysteresis=0, min_length=1, above=False):
+    """Return list of bounds and labels of runs in each score vector; see label_batch for the labels."""
+    labels, offsets = label_batch(scores_list, thresh, hysteresis, above)
+    return [find_bounds(labels[start:stop], min_length) for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def segment(scores, thresh, hysteresis=0, min_length=1, above=False):
+    """Return list of bounds and labels of runs in score vector; see label_batch for the labels."""
+    return segment_batch([scores], thresh, hysteresis, min_length, above)[0]
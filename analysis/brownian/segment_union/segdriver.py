@@ -0,0 +1,51 @@
+"""Read alignment ids and write segments of alignments segmented in a pool of workers.
+
+Workers return the segments of each alignment as a list of blocks, where each block is a list of rows with the
+columns ali_id, seq_id, bound, type, and seq. Segment and block ids are assigned as the results are written in
+alignment order, so the output is identical to segmenting the alignments serially.
+"""
+
+import csv
+
+
+def read_ali_ids(path):
+    """Yield alignment ids from the second column of a members file."""
+    with open(path) as file:
+        for line in file:
+            fields = line.split('\t')
+            yield fields[1]
+
+
+def format_id(num):
+    return hex(num)[2:].zfill(8)
+
+
+class SegmentWriter:
+    """Write blocks of segment rows to a TSV, numbering segments and blocks in the order they are written."""
+
+    def __init__(self, path, type_name, block_ids=False):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file, delimiter='\t', lineterminator='\n')  # Quotes fields as to_csv does
+        self.block_ids = block_ids
+        self.seg_num = 0
+        self.block_num = 0
+
+        id_names = ['seg_id', 'block_id'] if block_ids else ['seg_id']
+        self.writer.writerow(['ali_id', 'seq_id'] + id_names + ['bound', type_name, 'seq'])
+
+    def write(self, blocks):
+        for block in blocks:
+            for ali_id, seq_id, bound, label, seq in block:
+                ids = [format_id(self.seg_num)] + ([format_id(self.block_num)] if self.block_ids else [])
+                self.writer.writerow([ali_id, seq_id] + ids + [bound, label, seq])
+                self.seg_num += 1
+            self.block_num += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,103 +1,66 @@
 """Segment alignments by IUPRED2a and combine by union."""
 
 import gzip
+import iupred
+import msacoords
 import numpy as np
-import pandas as pd
-import subprocess
-import tempfile
+import pools
+import scorestore
+import segdriver
+import segmenter
 from Bio import AlignIO
 from scipy import ndimage
+from sys import argv
 
-# Input variables
-path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
-dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
-thresh = 0.5
 
-block_data = []  # Block data with raw sequences
-block_num = 0  # Counter for numbering blocks
-seg_num = 0  # Counter for numbering rows
+def score_batch(seqs):
+    """Return IUPred2A scores of seqs, loading parameters only if scores are missing from the store."""
+    return iupred.score_batch(seqs, iupred.load_params(iupred_dir))
 
-with open(path) as file:
-    for line in file:
-        fields = line.split('\t')
-        ali_id = fields[1]
-        with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
-            MSA = AlignIO.read(file_MSA, 'fasta')
-            MSA_iupred = np.empty((len(MSA), len(MSA[0])))
 
-            for idx, record in enumerate(MSA):
-                # Create map of ungapped to gapped coordinates
-                idx_ungap = -1  # i == j at first non-gap
-                bound_start_ungap = 0
-                bound_start_gap = 0
-                ungap_prev = record.seq[0] != '-'
-                coords = []
-                for idx_gap, sym in enumerate(record.seq):
-                    ungap_curr = sym != '-'
-                    idx_ungap += int(ungap_curr)
-                    if ungap_curr is not ungap_prev:
-                        gap_bound = (bound_start_gap, idx_gap)
-                        ungap_bound = (bound_start_ungap, idx_ungap + 1) if ungap_prev else ()
-                        coords.append((gap_bound, ungap_bound))
+def segment_ali(ali_id):
+    """Return segments of alignment as blocks of rows and scores of sequences missing from the store."""
+    with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
+        MSA = AlignIO.read(file_MSA, 'fasta')
 
-                        bound_start_ungap = idx_ungap
-                        bound_start_gap = idx_gap
-                    ungap_prev = ungap_curr
-                gap_bound = (bound_start_gap, idx_gap + 1)
-                ungap_bound = (bound_start_ungap, idx_ungap + 1) if ungap_prev else ()
-                coords.append((gap_bound, ungap_bound))
+    # Remove gaps from sequences and score
+    seqs = [str(record.seq).translate({ord('-'): None}) for record in MSA]
+    MSA_scores, new_scores = store.score(seqs, score_batch)
+    MSA_scores = [ndimage.gaussian_filter1d(scores, sigma, output=float) for scores in MSA_scores]
 
-                # Remove gaps from sequence
-                seq = str(record.seq).translate({ord('-'): None})
-                with tempfile.NamedTemporaryFile(mode='wt') as temp:
-                    # Write sequence to tempfile
-                    temp.write(seq)
-                    temp.seek(0)  # Set stream to file start
+    # Fill IUPRED array with scores
+    mask = msacoords.gap_mask([str(record.seq) for record in MSA])
+    MSA_iupred = msacoords.project(mask, MSA_scores, fill=-1)
+    scores = np.any(np.logical_and(0 < MSA_iupred, MSA_iupred < thresh), axis=0)
 
-                    # Execute IUPRED2a with tempfile
-                    process = subprocess.run(['python', '../../../bin/iupred2a/iupred2a.py', temp.name, 'long'],
-                                             capture_output=True, text=True, check=True)
+    # Find bounds
+    bounds = segmenter.find_bounds(scores, min_length)
 
-                # Extract scores from output
-                scores = []
-                for line in process.stdout.rstrip().split('\n'):  # Remove trailing newline to prevent empty line
-                    if line.startswith('#'):
-                        continue
-                    fields = line.split('\t')
-                    scores.append(float(fields[2]))
-                scores = ndimage.gaussian_filter1d(scores, 2)
+    # Create rows
+    blocks = []
+    for bound, ordered in bounds:
+        blocks.append([(ali_id, record.id, bound, ordered, str(record.seq[bound[0]:bound[1]])) for record in MSA])
+    return blocks, new_scores
 
-                # Fill IUPRED array with bools reflecting scores
-                for coord_gap, coord_ungap in coords:
-                    if coord_ungap is ():
-                        MSA_iupred[idx, coord_gap[0]:coord_gap[1]] = -1
-                    else:
-                        MSA_iupred[idx, coord_gap[0]:coord_gap[1]] = scores[coord_ungap[0]:coord_ungap[1]]
-            scores = np.any(np.logical_and(0 < MSA_iupred, MSA_iupred < 0.5), axis=0)
 
-            # Find bounds
-            bounds = []
-            ordered_prev = scores[0]
-            bound_start = 0
-            for i, score in enumerate(scores):
-                ordered_curr = score
-                if ordered_curr is not ordered_prev:
-                    bounds.append(((bound_start, i), ordered_prev))
-                    bound_start = i
-                ordered_prev = ordered_curr
-            bounds.append(((bound_start, i + 1), ordered_curr))  # Bound for final segment
+# Input variables
+_, pool_mode, num_workers = pools.parse_argv(argv)
+path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
+dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
+iupred_dir = '../../../bin/iupred2a/'
+store_path = '../../iupred2a_long.sstore/'  # Score store shared by segmentation scripts
+sigma = 2  # Standard deviation of Gaussian smoothing of scores
+thresh = 0.5
+min_length = 1  # Segments shorter than this are merged into their neighbors
 
-            # Create dataframe rows
-            for bound, ordered in bounds:
-                for record in MSA:
-                    block_data.append({'ali_id': ali_id, 'seq_id': record.id, 'seg_id': hex(seg_num)[2:].zfill(8),
-                                       'block_id': hex(block_num)[2:].zfill(8), 'bound': bound, 'ordered': ordered,
-                                       'seq': record.seq[bound[0]:bound[1]]})
-                    seg_num += 1
-                block_num += 1
+store = scorestore.ScoreStore(store_path, 'iupred2a_long')  # Workers read a snapshot of the store at start
 
-df = pd.DataFrame(block_data)
-df.to_csv('segment_union.tsv', sep='\t', index=False)
+if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    writer = segdriver.SegmentWriter('segment_union.tsv', 'ordered', block_ids=True)
+    with pools.Pool(pool_mode, num_workers) as pool, writer:
+        for blocks, new_scores in pool.imap(segment_ali, segdriver.read_ali_ids(path)):
+            store.put(new_scores)
+            writer.write(blocks)
 
 """
 DEPENDENCIES
@@ -105,4 +68,5 @@ DEPENDENCIES
     ../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv
 ../../EggNOGv5_validation/filter_unknown_realign/filter_unknown_realign.py
     ../../EggNOGv5_validation/filter_unknown_realign/out/align/
+../../../bin/iupred2a/data/
 """
\ No newline at end of file
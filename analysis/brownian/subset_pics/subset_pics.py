@@ -1,15 +1,16 @@
 """Create list of segments and features corresponding to the PICs."""
 
+import featstore
+import os
 import pandas as pd
 
 # Input variables
 seg_path = '../segment_avg/segment_avg.tsv'
-feature_path = '../feature_calc/features.tsv'
+feature_path = featstore.find_features('../feature_calc/features')  # Feature store if present, otherwise TSV
 pic_path = '../pic_calc/pics.tsv'
 
 # Read data
 segs = pd.read_csv(seg_path, sep='\t', keep_default_na=False)
-features = pd.read_csv(feature_path, sep='\t', index_col=list(range(5)))
 pics = pd.read_csv(pic_path, sep='\t', index_col=list(range(3)))
 
 # Filter segments
@@ -18,9 +19,8 @@ segs_pics = segs.loc[idx, :]
 segs_pics.to_csv('segments.tsv', sep='\t')
 
 # Filter features
-idx = features.index.get_level_values('block_id').isin(pics.index.unique('block_id'))
-features_pics = features.loc[idx, :]
-features_pics.to_csv('features.tsv', sep='\t')
+features_pics = featstore.read_keys(feature_path, 5, 'block_id', pics.index.unique('block_id'))
+featstore.write_features(features_pics, 'features' + os.path.splitext(feature_path)[1])  # Write in same format
 
 print('blocks in filtered segments:', len(segs_pics['block_id'].unique()))
 print('blocks in filtered features:', len(features_pics.index.unique('block_id')))
@@ -1,9 +1,10 @@
 """Extract HSPs from BLAST results"""
 
-import multiprocessing as mp
 import os
+import pools
 import re
 from itertools import groupby, permutations
+from sys import argv
 
 
 def parse_blast(query_species, subject_species):
@@ -122,7 +123,7 @@ columns = {'qppid': str, 'qgnid': str, 'qspid': str,
            'slen': int, 'sstart': int, 'send': int,
            'evalue': float, 'bitscore': float,
            'index_hsp': bool, 'disjoint': bool}
-num_processes = int(os.environ['SLURM_NTASKS'])
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 
 # Load pp metadata
 ppid2gnid = {}
@@ -141,8 +142,8 @@ with open('params.tsv') as file:
 
 # Parse BLAST results
 if __name__ == '__main__':
-    with mp.Pool(processes=num_processes) as pool:
-        pool.starmap(parse_blast, permutations(params.keys(), 2))
+    with pools.Pool(pool_mode, num_workers) as pool:
+        pools.pool_map(pool, parse_blast, permutations(params.keys(), 2), num_workers, star=True)
 
 """
 NOTES
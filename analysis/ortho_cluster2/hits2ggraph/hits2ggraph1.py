@@ -1,8 +1,9 @@
 """Convert hits to an undirected ggraph."""
 
-import multiprocessing as mp
 import os
 import pandas as pd
+import pools
+from sys import argv
 
 
 def load_hit(qspid, sspid):
@@ -18,14 +19,14 @@ def load_hit(qspid, sspid):
 dtypes = {'qppid': 'string', 'qgnid': 'string',
           'sppid': 'string', 'sgnid': 'string',
           'bitscore': float}
-num_processes = 2
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 
 if __name__ == '__main__':
     # Load data
-    with mp.Pool(processes=num_processes) as pool:
+    with pools.Pool(pool_mode, num_workers) as pool:
         tsvs = [(qspid, sspid) for qspid in os.listdir('../hsps2hits/out/')
                 for sspid in os.listdir(f'../hsps2hits/out/{qspid}/')]
-        hits = pd.concat(pool.starmap(load_hit, tsvs))
+        hits = pd.concat(pools.pool_map(pool, load_hit, tsvs, num_workers, star=True))
 
     ggraph = {}
     for (qgnid, sgnid), bitscore in hits.iteritems():
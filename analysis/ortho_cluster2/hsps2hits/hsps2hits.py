@@ -1,9 +1,10 @@
 """Convert HSPs to hits."""
 
-import multiprocessing as mp
 import numpy as np
 import os
+import pools
 from itertools import groupby
+from sys import argv
 
 
 def parse_hsp(qspid, sspid):
@@ -94,13 +95,13 @@ ocolumns = ['qppid', 'qgnid', 'qspid',
             'qlen', 'nqa', 'cnqa',
             'slen', 'nsa', 'cnsa',
             'bitscore']
-num_processes = 2
+_, pool_mode, num_workers = pools.parse_argv(argv)  # Pool options from arguments, environment, or CPU quota
 
 if __name__ == '__main__':
-    with mp.Pool(processes=num_processes) as pool:
+    with pools.Pool(pool_mode, num_workers) as pool:
         tsvs = [(qspid, sspid) for qspid in os.listdir('../blast2hsps/out/hsps/')
                 for sspid in os.listdir(f'../blast2hsps/out/hsps/{qspid}')]
-        pool.starmap(parse_hsp, tsvs)
+        pools.pool_map(pool, parse_hsp, tsvs, num_workers, star=True)
 
 """
 DEPENDENCIES
@@ -1,61 +1,56 @@
 """Segment alignments by alignment score and write subsequences to dataframe."""
 
 import gzip
-import pandas as pd
+import pools
+import segdriver
+import segmenter
 from Bio import AlignIO
 from Bio.SubsMat import MatrixInfo
 from itertools import combinations
 from scipy import ndimage
+from sys import argv
 
-path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
-dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
-matrix = MatrixInfo.blosum50
-thresh = 0
 
-segs = []  # Segment data with raw sequences
-seg_num = 0  # Counter for numbering rows
+def segment_ali(ali_id):
+    """Return segments of alignment as blocks of rows."""
+    with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
+        MSA = AlignIO.read(file_MSA, 'fasta')
+    row_len = len(MSA[0, :])
+    column_len = len(MSA)
 
-with open(path) as file:
-    for line in file:
-        fields = line.split('\t')
-        ali_id = fields[1]
-        with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
-            MSA = AlignIO.read(file_MSA, 'fasta')
-            row_len = len(MSA[0, :])
-            column_len = len(MSA)
+    # Calculate score of each column
+    column_scores = []
+    for i in range(row_len):
+        score = 0
+        for pair in combinations(MSA[:, i], 2):
+            score += matrix.get(pair, -2)
+        column_scores.append(score)
+    column_scores = ndimage.gaussian_filter1d(column_scores, sigma)
 
-            # Calculate score of each column
-            column_scores = []
-            for i in range(row_len):
-                score = 0
-                for pair in combinations(MSA[:, i], 2):
-                    score += matrix.get(pair, -2)
-                column_scores.append(score)
-            column_scores = ndimage.gaussian_filter1d(column_scores, 2)
+    # Find bounds
+    bounds = segmenter.segment(column_scores, thresh, hysteresis, min_length, above=True)
 
-            # Find bounds
-            bounds = []
-            conserved_prev = column_scores[0] > thresh
-            bound_start = 0
-            for i, score in enumerate(column_scores):
-                conserved_curr = score > thresh
-                if conserved_curr is not conserved_prev:
-                    bounds.append(((bound_start, i), conserved_prev))
-                    bound_start = i
-                conserved_prev = conserved_curr
-            bounds.append(((bound_start, i + 1), conserved_curr))  # Bound for final segment
+    # Create rows
+    blocks = []
+    for bound, conserved in bounds:
+        blocks.append([(ali_id, record.id, bound, conserved, str(record.seq[bound[0]:bound[1]])) for record in MSA])
+    return blocks
 
-            # Create dataframe rows
-            for bound, conserved in bounds:
-                for record in MSA:
-                    seq_raw = str(record.seq[slice(*bound)])
-                    seq_ungap = seq_raw.translate({ord('-'): None})
-                    segs.append({'ali_id': ali_id, 'seq_id': record.id, 'seg_id': hex(seg_num)[2:].zfill(8),
-                                 'bound': bound, 'conserved': conserved, 'seq': seq_raw})
-                    seg_num += 1
 
-df = pd.DataFrame(segs)
-df.to_csv('segment_aliscore.tsv', sep='\t', index=False)
+_, pool_mode, num_workers = pools.parse_argv(argv)
+path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
+dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
+matrix = MatrixInfo.blosum50
+sigma = 2  # Standard deviation of Gaussian smoothing of scores
+thresh = 0
+hysteresis = 0  # Labels only change at scores beyond thresh by this margin
+min_length = 1  # Segments shorter than this are merged into their neighbors
+
+if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    writer = segdriver.SegmentWriter('segment_aliscore.tsv', 'conserved')
+    with pools.Pool(pool_mode, num_workers) as pool, writer:
+        for blocks in pool.imap(segment_ali, segdriver.read_ali_ids(path)):
+            writer.write(blocks)
 
 """
 DEPENDENCIES
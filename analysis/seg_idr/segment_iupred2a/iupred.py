@@ -0,0 +1,93 @@
+"""Score disorder of sequences with IUPred2A (long) in the current process.
+
+The energy matrix and histogram are read once from the IUPred2A distribution, and the scores of a batch of sequences
+are calculated with windowed sums over the concatenated sequences. The windows and the mapping of energies to scores
+follow iupred2a_lib.py, so the scores match the output of iupred2a.py with the long option.
+"""
+
+import numpy as np
+from functools import lru_cache
+
+alphabet = 'ACDEFGHIKLMNPQRSTVWY'
+lower, upper, smooth_window = 1, 100, 10  # Window parameters for long disorder
+
+
+@lru_cache(maxsize=None)
+def load_params(iupred_dir):
+    """Return energy matrix and histogram of IUPred2A (long) read from the directory of iupred2a.py.
+
+    Symbols outside the alphabet have the final index, whose energies are zero.
+    """
+    matrix = np.zeros((len(alphabet) + 1, len(alphabet) + 1))
+    with open(iupred_dir + 'data/iupred2_long_energy_matrix') as file:
+        for line in file:
+            fields = line.split()
+            matrix[alphabet.index(fields[0]), alphabet.index(fields[1])] = float(fields[2])
+
+    bins, hist = [], []
+    with open(iupred_dir + 'data/long_histogram') as file:
+        for line in file:
+            if line.startswith('#'):
+                continue
+            fields = line.split()
+            bins.append(float(fields[1]))
+            hist.append(float(fields[-1]))
+    h_min, h_max = min(bins), max(bins)
+    h_step = (h_max - h_min) / len(hist)
+    return matrix, np.array(hist), (h_min, h_max, h_step)
+
+
+def encode(seqs):
+    """Return alphabet indices of concatenated seqs and the start offset of each sequence."""
+    table = np.full(256, len(alphabet), dtype=np.int64)
+    table[np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)] = np.arange(len(alphabet))
+    codes = table[np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)]
+    starts = np.zeros(len(seqs) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum([len(seq) for seq in seqs])
+    return codes, starts
+
+
+def window_sum(cumsum, left, right):
+    return cumsum[right] - cumsum[left]
+
+
+def score_batch(seqs, params):
+    """Return list of arrays of IUPred2A (long) scores for each sequence in seqs."""
+    matrix, hist, (h_min, h_max, h_step) = params
+    seqs = list(seqs)
+    codes, starts = encode(seqs)
+    lengths = np.diff(starts)
+    seq_starts = np.repeat(starts[:-1], lengths)  # Start and stop of the sequence containing each position
+    seq_stops = np.repeat(starts[1:], lengths)
+    positions = np.arange(len(codes))
+
+    # Energy of each residue with the composition of the residues 2 to 100 positions away on either side
+    # The contribution of residues with symbol a to the energy of residue i is matrix[codes[i], a] * count(a)
+    counts = np.zeros((len(codes) + 1, matrix.shape[0]))
+    counts[np.arange(1, len(codes) + 1), codes] = 1
+    counts = np.cumsum(counts, axis=0)
+    left = np.maximum(seq_starts, positions - upper), np.maximum(seq_starts, positions - lower)
+    right = np.minimum(seq_stops, positions + lower + 1), np.minimum(seq_stops, positions + upper + 1)
+    window_counts = window_sum(counts, *left) + window_sum(counts, *right)
+    window_lengths = window_counts.sum(axis=1)
+    energies = np.einsum('ij,ij->i', matrix[codes], window_counts)
+    energies = np.divide(energies, window_lengths, out=np.zeros(len(codes)), where=window_lengths > 0)
+
+    # Average energies in window of 10 on either side truncated at the sequence ends
+    cumsum = np.zeros(len(codes) + 1)
+    cumsum[1:] = np.cumsum(energies)
+    smooth_left = np.maximum(seq_starts, positions - smooth_window)
+    smooth_right = np.minimum(seq_stops, positions + smooth_window + 1)
+    energies = window_sum(cumsum, smooth_left, smooth_right) / (smooth_right - smooth_left)
+
+    # Convert energies to scores with histogram
+    bins = np.clip(((energies - h_min) * (1 / h_step)).astype(np.int64), 0, len(hist) - 1)
+    scores = hist[bins]
+    scores[energies >= h_max - 2 * h_step] = 0
+    scores[energies <= h_min + 2 * h_step] = 1
+    return np.split(scores, starts[1:-1])
+
+
+def score(seq, params):
+    """Return array of IUPred2A (long) scores of seq."""
+    return score_batch([seq], params)[0]
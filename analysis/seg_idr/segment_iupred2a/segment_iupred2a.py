@@ -1,73 +1,62 @@
 """Segment alignments by IUPRED2a score and write subsequences to dataframe."""
 
 import gzip
-import pandas as pd
-import subprocess
-import tempfile
+import iupred
+import pools
+import scorestore
+import segdriver
+import segmenter
 from Bio import AlignIO
 from scipy import ndimage
+from sys import argv
 
-path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
-dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
-thresh = 0.5
 
-seg_data = []  # Segment data with raw sequences
-seg_num = 0  # Counter for numbering rows
+def score_batch(seqs):
+    """Return IUPred2A scores of seqs, loading parameters only if scores are missing from the store."""
+    return iupred.score_batch(seqs, iupred.load_params(iupred_dir))
 
-with open(path) as file:
-    for line in file:
-        fields = line.split('\t')
-        ali_id = fields[1]
-        with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
-            MSA = AlignIO.read(file_MSA, 'fasta')
-            for record in MSA:
-                seq = str(record.seq).translate({ord('-'): None})
-                with tempfile.NamedTemporaryFile(mode='wt') as temp:
-                    # Write sequence to tempfile
-                    temp.write(seq)
-                    temp.seek(0)  # Set stream to file start
 
-                    # Execute IUPRED2a with tempfile
-                    process = subprocess.run(['python', '../../../bin/iupred2a/iupred2a.py', temp.name, 'long'],
-                                             capture_output=True, text=True, check=True)
+def segment_ali(ali_id):
+    """Return segments of each sequence in alignment as blocks and scores of sequences missing from the store."""
+    blocks = []
+    with gzip.open(dir + ali_id + '.raw_alg.faa.gz', 'rt') as file_MSA:  # read, text mode
+        MSA = AlignIO.read(file_MSA, 'fasta')
+    # Remove gaps from sequences and score
+    seqs = [str(record.seq).translate({ord('-'): None}) for record in MSA]
+    MSA_scores, new_scores = store.score(seqs, score_batch)
+    MSA_scores = [ndimage.gaussian_filter1d(scores, sigma, output=float) for scores in MSA_scores]
+    MSA_bounds = segmenter.segment_batch(MSA_scores, thresh, hysteresis, min_length)
+    for record, seq, bounds in zip(MSA, seqs, MSA_bounds):
+        # Create rows; each segment is its own block
+        for bound, ordered in bounds:
+            blocks.append([(ali_id, record.id, bound, ordered, seq[bound[0]:bound[1]])])
+    return blocks, new_scores
 
-                # Extract scores from output
-                scores = []
-                for line in process.stdout.rstrip().split('\n'):  # Remove trailing newline to prevent empty line
-                    if line.startswith('#'):
-                        continue
-                    fields = line.split('\t')
-                    scores.append(float(fields[2]))
-                scores = ndimage.gaussian_filter1d(scores, 2)
 
-                # Find bounds
-                bounds = []
-                ordered_prev = scores[0] < thresh
-                bound_start = 0
-                for i, score in enumerate(scores):
-                    ordered_curr = score < thresh
-                    if ordered_curr is not ordered_prev:
-                        bounds.append(((bound_start, i), ordered_prev))
-                        bound_start = i
-                    ordered_prev = ordered_curr
-                bounds.append(((bound_start, i + 1), ordered_curr))  # Bound for final segment
+_, pool_mode, num_workers = pools.parse_argv(argv)
+path = '../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv'
+dir = '../../EggNOGv5_validation/filter_unknown_realign/out/align/'
+iupred_dir = '../../../bin/iupred2a/'
+store_path = '../../iupred2a_long.sstore/'  # Score store shared by segmentation scripts
+sigma = 2  # Standard deviation of Gaussian smoothing of scores
+thresh = 0.5
+hysteresis = 0  # Labels only change at scores beyond thresh by this margin
+min_length = 1  # Segments shorter than this are merged into their neighbors
 
-                # Create dataframe rows
-                for bound, ordered in bounds:
-                    seg_data.append({'ali_id': ali_id, 'seq_id': record.id, 'seg_id': hex(seg_num)[2:].zfill(8),
-                                     'bound': bound, 'ordered': ordered, 'seq': seq[bound[0]:bound[1]]})
-                    seg_num += 1
+store = scorestore.ScoreStore(store_path, 'iupred2a_long')  # Workers read a snapshot of the store at start
 
-df = pd.DataFrame(seg_data)
-df.to_csv('segment_iupred2a.tsv', sep='\t', index=False)
+if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    writer = segdriver.SegmentWriter('segment_iupred2a.tsv', 'ordered')
+    with pools.Pool(pool_mode, num_workers) as pool, writer:
+        for blocks, new_scores in pool.imap(segment_ali, segdriver.read_ali_ids(path)):
+            store.put(new_scores)
+            writer.write(blocks)
 
 """
-NOTES
-Must run in bash shell to allow correct behavior of NamedTemporaryFile
-
 DEPENDENCIES
 ../../EggNOGv5_validation/filter_count/filter_count.py
     ../../EggNOGv5_validation/filter_count/out/7214_noX_members/10_10_members.tsv
 ../../EggNOGv5_validation/filter_unknown_realign/filter_unknown_realign.py
     ../../EggNOGv5_validation/filter_unknown_realign/out/align/
+../../../bin/iupred2a/data/
 """
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""Benchmark hot paths of the feature, segmentation, and clustering scripts on synthetic fixtures.
+
+Results are written to bench.tsv. If the path to a previous results file is given, throughput and peak memory are
+compared against it, and the script exits with status 1 if any benchmark regressed by more than the tolerance.
+
+Usage: python bench.py [baseline.tsv]
+"""
+
+import ast
+import os
+import sys
+import time
+import tracemalloc
+
+import fixtures
+import numpy as np
+import pandas as pd
+
+
+def load_functions(path):
+    """Return namespace of imports, classes, and functions defined in a script without running its top-level code."""
+    with open(path) as file:
+        tree = ast.parse(file.read(), path)
+    body = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef))]
+    namespace = {'__name__': os.path.splitext(os.path.basename(path))[0]}
+    sys.path.insert(0, os.path.dirname(path))  # Allow imports of modules copied next to the script
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, 'exec'), namespace)
+    return namespace
+
+
+def measure(func, num_repeats):
+    """Return best time in seconds over repeats of func and peak traced memory in bytes of a separate run."""
+    times = []
+    for _ in range(num_repeats):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()  # Traced separately since tracing slows allocation
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def check(condition, message):
+    if not condition:
+        raise RuntimeError(f'Benchmark result is incorrect: {message}')
+
+
+# Input variables
+baseline_path = sys.argv[1] if len(sys.argv) > 1 else None
+out_path = 'bench.tsv'
+seed = 1
+num_repeats = 5
+tolerance = 0.15  # Fractional decrease in throughput or increase in memory reported as a regression
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+seqfeat_dir = os.path.join(root, 'src/feature_calc_scripts/')
+segment_dir = os.path.join(root, 'analysis/brownian/segment_avg/')
+triDFS_dir = os.path.join(root, 'analysis/ortho_cluster3/subcluster3_ggraph/')
+clique_path = os.path.join(root, 'analysis/ortho_cluster3/clique5+_community/clique5+_community2.py')
+
+if __name__ == '__main__':
+    sys.path.insert(0, seqfeat_dir)
+    sys.path.insert(0, triDFS_dir)
+    sys.path.insert(0, segment_dir)
+    import msacoords
+    import seqfeat
+    import triDFS
+    import networkx as nx
+    k_clique_communities_progressive = load_functions(clique_path)['k_clique_communities_progressive']
+
+    # Make fixtures
+    rng = np.random.default_rng(seed)
+    disorder_seqs = fixtures.disorder_seqs(rng, 5000)
+    ordered_seqs = fixtures.ordered_seqs(rng, 2000)
+    msas = [fixtures.msa(rng) for _ in range(500)]
+    msa_scores = [[rng.random(len(seq) - seq.count('-')) for seq in MSA] for MSA in msas]  # Per-residue scores
+    graph, structure = fixtures.gene_graph(1000)
+    CCs = fixtures.components(graph)
+    check(len(CCs) == structure['num_components'], 'number of components in gene graph')
+
+    # Define benchmarks as name, function, number of items, and unit of items
+    def feat_all(seqs):
+        return lambda: [seqfeat.feat_all(seq) for seq in seqs]
+
+    def feat_batch(seqs):
+        return lambda: seqfeat.feat_batch(seqs)
+
+    def project():
+        for MSA, scores in zip(msas, msa_scores):
+            msacoords.project(msacoords.gap_mask(MSA), scores, fill=-1)
+
+    def cluster():
+        OGs = triDFS.cluster(graph)
+        check(len(OGs) == structure['num_clusters'], 'number of triangle clusters')
+
+    def communities():
+        num_communities = 0
+        for CC in CCs:
+            G = nx.Graph([(node, adj) for node in CC for adj in graph[node]])
+            num_communities += len(list(k_clique_communities_progressive(G, structure['k'])))
+        check(num_communities == structure['num_clusters'], 'number of k-clique communities')
+
+    benchmarks = [('feat_all_disorder', feat_all(disorder_seqs[:50]), 50, 'seqs'),
+                  ('feat_all_ordered', feat_all(ordered_seqs[:10]), 10, 'seqs'),
+                  ('feat_batch_disorder', feat_batch(disorder_seqs), len(disorder_seqs), 'seqs'),
+                  ('feat_batch_ordered', feat_batch(ordered_seqs), len(ordered_seqs), 'seqs'),
+                  ('segment_project_scores', project, sum(map(len, msas)), 'rows'),
+                  ('triDFS_cluster', cluster, len(graph), 'nodes'),
+                  ('k_clique_communities_progressive', communities, len(CCs), 'components')]
+
+    # Run benchmarks
+    baseline = None if baseline_path is None else pd.read_csv(baseline_path, sep='\t', index_col='name')  # Read first since it may be overwritten
+    rows = []
+    for name, func, num_items, unit in benchmarks:
+        seconds, peak = measure(func, num_repeats)
+        rows.append({'name': name, 'unit': unit, 'items': num_items, 'seconds': seconds,
+                     'throughput': num_items / seconds, 'peak_MB': peak / 1E6})
+        print(f'{name}: {num_items / seconds:.1f} {unit}/s, {peak / 1E6:.2f} MB')
+    results = pd.DataFrame(rows).set_index('name')
+    results.to_csv(out_path, sep='\t')
+
+    # Compare to baseline
+    if baseline is not None:
+        names = results.index.intersection(baseline.index)
+        comparison = pd.DataFrame({'throughput_ratio': results.loc[names, 'throughput'] / baseline.loc[names, 'throughput'],
+                                   'peak_ratio': results.loc[names, 'peak_MB'] / baseline.loc[names, 'peak_MB']})
+        comparison['regressed'] = (comparison['throughput_ratio'] < 1 - tolerance) | (comparison['peak_ratio'] > 1 + tolerance)
+        print()
+        print(comparison.to_string(float_format=lambda x: f'{x:.2f}'))
+        if comparison['regressed'].any():
+            sys.exit(1)
@@ -0,0 +1,86 @@
+"""Synthetic fixtures for benchmarks with controlled length distributions and known structure."""
+
+import numpy as np
+
+alphabet = 'ACDEFGHIKLMNPQRSTVWY'
+ordered_weights = [8.25, 1.37, 5.45, 6.75, 3.86, 7.07, 2.27, 5.96, 5.84, 9.66,
+                   2.42, 4.06, 4.70, 3.93, 5.53, 6.56, 5.34, 6.87, 1.08, 2.92]  # Background frequencies of UniProt
+disorder_weights = [8.00, 0.50, 5.50, 9.00, 1.50, 8.00, 2.00, 2.50, 8.00, 5.00,
+                    1.50, 4.50, 9.00, 6.00, 5.00, 10.0, 6.00, 3.50, 0.40, 1.50]  # Enriched in disorder-promoting residues
+
+
+def sample_seqs(rng, num_seqs, weights, median_len, sigma=0.8, max_len=5000):
+    """Return list of sequences with log-normal lengths and residues drawn independently from weights."""
+    lengths = np.clip(np.rint(rng.lognormal(np.log(median_len), sigma, num_seqs)), 1, max_len).astype(int)
+    p = np.array(weights) / sum(weights)
+    syms = np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)
+    buffer = syms[rng.choice(len(alphabet), size=lengths.sum(), p=p)].tobytes().decode('ascii')
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [buffer[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def disorder_seqs(rng, num_seqs, median_len=40):
+    return sample_seqs(rng, num_seqs, disorder_weights, median_len)
+
+
+def ordered_seqs(rng, num_seqs, median_len=150):
+    return sample_seqs(rng, num_seqs, ordered_weights, median_len)
+
+
+def msa(rng, num_seqs=10, num_cols=500, gap_rate=0.02, mean_gap_len=8):
+    """Return list of aligned sequences derived from a common ancestor with runs of gaps.
+
+    Gap runs start at each column with probability gap_rate and have geometric lengths with mean mean_gap_len.
+    """
+    ancestor = np.array(list(sample_seqs(rng, 1, ordered_weights, num_cols, sigma=0)[0]))
+    rows = []
+    for _ in range(num_seqs):
+        row = ancestor.copy()
+        for start in np.flatnonzero(rng.random(num_cols) < gap_rate):
+            row[start:start + rng.geometric(1 / mean_gap_len)] = '-'
+        if (row == '-').all():  # Alignments do not contain empty sequences
+            row[rng.integers(num_cols)] = ancestor[0]
+        rows.append(''.join(row))
+    return rows
+
+
+def gene_graph(num_components, num_cliques=4, clique_size=6):
+    """Return undirected graph as dictionary of node: set of adjacent nodes and its known structure.
+
+    Each component is a chain of cliques. In even components, adjacent cliques share all but one node, so the component
+    is a single triangle-connected cluster and a single k-clique community for k = clique_size - 1 whether cliques
+    percolate at k - 1 or k shared nodes. In odd components, adjacent cliques share a single node, so each clique is a
+    separate cluster and community.
+    """
+    graph = {}
+    num_clusters = 0
+    node_num = 0
+    for i in range(num_components):
+        overlap = clique_size - 1 if i % 2 == 0 else 1
+        for j in range(num_cliques):
+            start = node_num + j * (clique_size - overlap)
+            nodes = [f'gene{n:07d}' for n in range(start, start + clique_size)]
+            for node in nodes:
+                graph.setdefault(node, set()).update([adj for adj in nodes if adj != node])
+        node_num = start + clique_size
+        num_clusters += 1 if i % 2 == 0 else num_cliques
+    return graph, {'num_components': num_components, 'num_clusters': num_clusters, 'k': clique_size - 1}
+
+
+def components(graph):
+    """Return list of sets of nodes in each connected component."""
+    marked = set()
+    CCs = []
+    for node in graph:
+        if node in marked:
+            continue
+        CC, stack = set(), [node]
+        while stack:
+            curr = stack.pop()
+            if curr in CC:
+                continue
+            CC.add(curr)
+            stack.extend(graph[curr] - CC)
+        marked |= CC
+        CCs.append(CC)
+    return CCs
@@ -1,15 +1,11 @@
 """Calculate and plot amino acid compositions."""
 
+import aacomp
 import matplotlib.pyplot as plt
 import pandas as pd
 from numpy import arange
 from sys import argv
 
-
-def counts(seq):
-    return {char: seq.count(char) for char in alphabet}
-
-
 # Input variables
 path = argv[1]  # Path to segmented sequences .tsv
 type_name = argv[2]  # Name of column denoting segment type
@@ -18,16 +14,16 @@ F_name = argv[4]  # Name of False type in sentence case
 
 # Constants
 bar_width = 0.35
-alphabet = 'DEHKRNQSTAILMVFWYCGP'
+alphabet = aacomp.alphabet
 
 # Read data and split segments
 segs = pd.read_csv(path, sep='\t', keep_default_na=False)
 T_segs = segs[segs[type_name]]
 F_segs = segs[~segs[type_name]]
 
-# Get counts as series of dict, convert series to list to dataframe, sum counts, reorder
-T_counts = pd.DataFrame(T_segs['seq'].apply(counts).to_list()).agg('sum')[list(alphabet)]
-F_counts = pd.DataFrame(F_segs['seq'].apply(counts).to_list()).agg('sum')[list(alphabet)]
+# Get count matrices and sum counts over sequences
+T_counts = pd.Series(aacomp.count_matrix(T_segs['seq']).sum(axis=0), index=list(alphabet))
+F_counts = pd.Series(aacomp.count_matrix(F_segs['seq']).sum(axis=0), index=list(alphabet))
 
 # Get total sum and convert counts to fraction
 T_sum = T_counts.agg('sum')
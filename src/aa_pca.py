@@ -1,5 +1,6 @@
 """Perform PCA and visualization of two types of subsequences."""
 
+import aacomp
 import matplotlib.pyplot as plt
 import numpy as np
 import os
@@ -9,10 +10,6 @@ from sklearn.decomposition import PCA
 from sys import argv
 
 
-def fracs(seq):
-    return {char: seq.count(char) / len(seq) for char in alphabet}
-
-
 # Input variables
 segment_dir = argv[1]  # Segment directory must end in /
 type_name = argv[2]  # Name of column denoting segment type
@@ -20,27 +17,24 @@ T_name = argv[3]  # Name of True type in sentence case
 F_name = argv[4]  # Name of False type in sentence case
 
 # Constants
-alphabet = 'DEHKRNQSTAILMVFWYCGP'
 n_components = 5
 
 pcas = {}
 paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
 for path in paths:
-    # Read data and split segments
+    # Read data
     segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
-    T_seqs = segs.loc[segs[type_name], 'seq']
-    F_seqs = segs.loc[~segs[type_name], 'seq']  # ~ is bitwise NOT operator; it interacts properly with numpy objects but not Python booleans
+    types = segs[type_name].to_numpy()
 
     # Get file index
     j0 = path.find('_')
     j1 = path.find('.tsv')
     i = int(path[j0 + 1:j1])
 
-    # Calculate fractions and convert to array
-    T_features = T_seqs.apply(fracs)
-    F_features = F_seqs.apply(fracs)
-    T_array = np.array([[*entry.values()] for entry in T_features])
-    F_array = np.array([[*entry.values()] for entry in F_features])
+    # Calculate fractions, reusing the matrix saved with the sample file if it is unchanged
+    fractions = aacomp.cached_fraction_matrix(segment_dir + path, segs['seq'])
+    T_array = fractions[types]
+    F_array = fractions[~types]  # ~ is bitwise NOT operator; it interacts properly with numpy objects but not Python booleans
     array = np.concatenate((T_array, F_array), axis=0)
 
     # Calculate PCAs and transform subsets
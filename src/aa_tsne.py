@@ -1,94 +1,140 @@
 """Perform t-SNE and visualization of two types of subsequences."""
 
+import aacomp
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import pandas as pd
-import pickle
+import pools
 import re
+import shutil
+import tempfile
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import PCA
 from sklearn.manifold import TSNE
+from sklearn.neighbors import NearestNeighbors
 from sys import argv
 
 
-def fracs(seq):
-    return {char: seq.count(char) / len(seq) for char in alphabet}
+def prepare(path):
+    """Return file index, segment types, and path to saved neighbors and initial embedding of sample file."""
+    # Read data
+    segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
+    types = segs[type_name].to_numpy()
+
+    # Get file index
+    j0 = path.find('_')
+    j1 = path.find('.tsv')
+    i = path[j0 + 1:j1]
+
+    # Calculate fractions, reusing the matrix saved with the sample file if it is unchanged
+    fractions = aacomp.cached_fraction_matrix(segment_dir + path, segs['seq'])
+    T_array = fractions[types]
+    F_array = fractions[~types]  # ~ is bitwise NOT operator; it interacts properly with numpy objects but not Python booleans
+    array = np.concatenate((T_array, F_array), axis=0)
+
+    # Find neighbors once for the largest perplexity; smaller perplexities use the nearest subset of these neighbors
+    # Each point is included as its own first neighbor since TSNE removes it from precomputed graphs
+    num_neighbors = min(len(array) - 1, int(3 * max(perplexities) + 1)) + 1  # Number of neighbors used by TSNE
+    distances, indices = NearestNeighbors(n_neighbors=num_neighbors, n_jobs=num_workers).fit(array).kneighbors(array)
+
+    # Initialize embedding with PCA as TSNE does, since it cannot be computed from precomputed distances
+    init = PCA(n_components=2).fit_transform(array).astype(np.float32)
+    init = init / np.std(init[:, 0]) * 1E-4
+
+    prefix = os.path.join(tmp_dir, f'{i}_')
+    np.save(prefix + 'distances.npy', distances.astype(np.float32))
+    np.save(prefix + 'indices.npy', indices.astype(np.int32))
+    np.save(prefix + 'init.npy', init)
+    return i, types, prefix
+
+
+def fit_tsne(i, perplexity, prefix):
+    """Return file index, perplexity, embedding, and KL divergence of t-SNE fit from saved neighbors."""
+    distances = np.load(prefix + 'distances.npy', mmap_mode='r')
+    indices = np.load(prefix + 'indices.npy', mmap_mode='r')
+    n, k = len(distances), min(len(distances) - 1, int(3 * perplexity + 1)) + 1
+    graph = csr_matrix((np.ravel(distances[:, :k]), np.ravel(indices[:, :k]), np.arange(0, n * k + 1, k)), shape=(n, n))
+
+    tsne = TSNE(n_components=2, perplexity=perplexity, metric='precomputed', init=np.load(prefix + 'init.npy'))
+    embedding = tsne.fit_transform(graph)
+    return i, perplexity, embedding.astype(np.float32), tsne.kl_divergence_
+
+
+def tasks(paths):
+    """Yield t-SNE tasks for each file and perplexity, preparing each file as its tasks are requested."""
+    for path in paths:
+        i, types, prefix = prepare(path)
+        file_types[i] = types
+        for perplexity in perplexities:
+            yield i, perplexity, prefix
+
+
+def fit_task(task):
+    return fit_tsne(*task)
 
 
 # Input variables
+argv, pool_mode, num_workers = pools.parse_argv(argv)  # Remove pool options from arguments
 segment_dir = argv[1]  # Segment directory must end in /
 type_name = argv[2]  # Name of column denoting segment type
 T_name = argv[3]  # Name of True type in sentence case
 F_name = argv[4]  # Name of False type in sentence case
 
 # Constants
-alphabet = 'DEHKRNQSTAILMVFWYCGP'
 n_components = 5
-
-paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
-for path in paths:
-    kl_divs = []
-
-    # Read data and split segments
-    segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
-    T_seqs = segs.loc[segs[type_name], 'seq']
-    F_seqs = segs.loc[~segs[type_name], 'seq']  # ~ is bitwise NOT operator; it interacts properly with numpy objects but not Python booleans
-
-    # Get file index
-    j0 = path.find('_')
-    j1 = path.find('.tsv')
-    i = path[j0 + 1:j1]
-
-    # Calculate fractions and convert to array
-    T_features = T_seqs.apply(fracs)
-    F_features = F_seqs.apply(fracs)
-    T_array = np.array([[*entry.values()] for entry in T_features])
-    F_array = np.array([[*entry.values()] for entry in F_features])
-    array = np.concatenate((T_array, F_array), axis=0)
-
-    # Make output directories for feature sets
-    cur_dir = f'{i}/'
-    if not os.path.exists(cur_dir):
-        os.makedirs(cur_dir)  # Recursive folder creation
-
-    for j in [5 * 2 ** x for x in range(8)]:
-        # Calculate PCAs and transform subsets
-        tsne = TSNE(n_components=2, perplexity=j)
-        transform = tsne.fit_transform(array)
-        T_tsne = transform[segs[type_name], :]
-        F_tsne = transform[~segs[type_name], :]
-        kl_divs.append((j, tsne.kl_divergence_))  # Store model for later output
-
-        # Plot t-SNEs
-        # One panel
-        fig, ax = plt.subplots()
-        fig.subplots_adjust(bottom=0.175)
-        ax.scatter(T_tsne[:, 0], T_tsne[:, 1], s=2, alpha=0.1, label=T_name)
-        ax.scatter(F_tsne[:, 0], F_tsne[:, 1], s=2, alpha=0.1, label=F_name)
-        ax.set_title(f't-SNE of Amino Acid Fractions\nin {T_name} and {F_name} Subsequences')
-        leg = fig.legend(bbox_to_anchor=(0.5, 0), loc='lower center', ncol=2, markerscale=2.5)
-        for lh in leg.legendHandles:
-            lh.set_alpha(1)
-        plt.savefig(cur_dir + f'aa_tsne{j}_combined.png')
-        plt.close()
-
-        # Two panels
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(5, 7.5), sharex=True, sharey=True)
-        fig.subplots_adjust(left=0.15)
-        ax1.scatter(T_tsne[:, 0], T_tsne[:, 1], s=2, alpha=0.1, label=T_name, color='C0')
-        ax2.scatter(F_tsne[:, 0], F_tsne[:, 1], s=2, alpha=0.1, label=F_name, color='C1')
-        ax1.set_title(f't-SNE of Amino Acid Fractions\nin {T_name} and {F_name} Subsequences')
-        leg = fig.legend(bbox_to_anchor=(0.525, 0), loc='lower center', ncol=2, markerscale=2.5)
-        for lh in leg.legendHandles:
-            lh.set_alpha(1)
-        plt.savefig(cur_dir + f'aa_tsne{j}_separate.png')
-        plt.close()
-
-        # Write model
-        with open(cur_dir + f'model{j}.pickle', 'wb') as file:
-            pickle.dump(tsne, file)
+perplexities = [5 * 2 ** x for x in range(8)]
+
+if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    tmp_dir = tempfile.mkdtemp()  # Neighbors are shared with workers through memory-mapped files
+    file_types = {}
+    kl_divs = {}
+    paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
+    try:
+        with pools.Pool(pool_mode, num_workers) as pool:
+            for i, j, transform, kl_div in pool.imap_unordered(fit_task, tasks(paths)):
+                T_tsne = transform[file_types[i], :]
+                F_tsne = transform[~file_types[i], :]
+                kl_divs.setdefault(i, []).append((j, kl_div))  # Store model summary for later output
+
+                # Make output directories for feature sets
+                cur_dir = f'{i}/'
+                if not os.path.exists(cur_dir):
+                    os.makedirs(cur_dir)  # Recursive folder creation
+
+                # Plot t-SNEs
+                # One panel
+                fig, ax = plt.subplots()
+                fig.subplots_adjust(bottom=0.175)
+                ax.scatter(T_tsne[:, 0], T_tsne[:, 1], s=2, alpha=0.1, label=T_name)
+                ax.scatter(F_tsne[:, 0], F_tsne[:, 1], s=2, alpha=0.1, label=F_name)
+                ax.set_title(f't-SNE of Amino Acid Fractions\nin {T_name} and {F_name} Subsequences')
+                leg = fig.legend(bbox_to_anchor=(0.5, 0), loc='lower center', ncol=2, markerscale=2.5)
+                for lh in leg.legendHandles:
+                    lh.set_alpha(1)
+                plt.savefig(cur_dir + f'aa_tsne{j}_combined.png')
+                plt.close()
+
+                # Two panels
+                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(5, 7.5), sharex=True, sharey=True)
+                fig.subplots_adjust(left=0.15)
+                ax1.scatter(T_tsne[:, 0], T_tsne[:, 1], s=2, alpha=0.1, label=T_name, color='C0')
+                ax2.scatter(F_tsne[:, 0], F_tsne[:, 1], s=2, alpha=0.1, label=F_name, color='C1')
+                ax1.set_title(f't-SNE of Amino Acid Fractions\nin {T_name} and {F_name} Subsequences')
+                leg = fig.legend(bbox_to_anchor=(0.525, 0), loc='lower center', ncol=2, markerscale=2.5)
+                for lh in leg.legendHandles:
+                    lh.set_alpha(1)
+                plt.savefig(cur_dir + f'aa_tsne{j}_separate.png')
+                plt.close()
+
+                # Write embedding
+                np.save(cur_dir + f'embedding{j}.npy', transform)
+    finally:
+        shutil.rmtree(tmp_dir)
 
     # Write model summaries
-    with open(cur_dir + 'model_summary.txt', 'w') as file:
-        file.write('#perplexity\tKL_divergence\n')
-        for perp, kl_div in kl_divs:
-            file.write(f'{perp}\t{kl_div}\n')
+    for i, file_kl_divs in kl_divs.items():
+        with open(f'{i}/model_summary.txt', 'w') as file:
+            file.write('#perplexity\tKL_divergence\n')
+            for perp, kl_div in sorted(file_kl_divs):
+                file.write(f'{perp}\t{kl_div}\n')
@@ -0,0 +1,56 @@
+"""Amino acid compositions of sequences computed with a lookup table over their concatenated residues."""
+
+import hashlib
+import numpy as np
+import os
+
+alphabet = 'DEHKRNQSTAILMVFWYCGP'
+
+
+def count_matrix(seqs, alphabet=alphabet):
+    """Return (number of sequences x alphabet) matrix of symbol counts; symbols outside the alphabet are not counted."""
+    seqs = list(seqs)
+    table = np.full(256, len(alphabet), dtype=np.int64)  # Symbols outside the alphabet map to a final discarded code
+    for code, sym in enumerate(alphabet):
+        table[ord(sym)] = code
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    codes = table[np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)]
+    seq_idx = np.repeat(np.arange(len(seqs)), lengths)
+    num_syms = len(alphabet) + 1
+    counts = np.bincount(seq_idx * num_syms + codes, minlength=len(seqs) * num_syms).reshape(len(seqs), num_syms)
+    return counts[:, :-1]
+
+
+def fraction_matrix(seqs, alphabet=alphabet):
+    """Return (number of sequences x alphabet) matrix of the fraction of each sequence of each symbol."""
+    seqs = list(seqs)
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    return count_matrix(seqs, alphabet) / lengths[:, None]
+
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def cached_fraction_matrix(path, seqs, alphabet=alphabet):
+    """Return fraction matrix of seqs read from path, reusing the matrix saved next to path if the file is unchanged.
+
+    The matrix is saved next to path with the extension .aacomp.npz along with the hash of the file contents and the
+    alphabet, so it is recomputed if either changes.
+    """
+    cache_path = os.path.splitext(path)[0] + '.aacomp.npz'
+    digest = file_hash(path)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            if cache['hash'] == digest and cache['alphabet'] == alphabet:
+                return cache['fractions']
+
+    fractions = fraction_matrix(seqs, alphabet)
+    with open(cache_path + '.tmp', 'wb') as file:  # Prevent other scripts from loading a partial cache
+        np.savez(file, hash=digest, alphabet=alphabet, fractions=fractions)
+    os.replace(cache_path + '.tmp', cache_path)
+    return fractions
@@ -0,0 +1,71 @@
+"""Write chunks of output to shards with completion markers so interrupted runs resume after the last finished chunk."""
+
+import hashlib
+import os
+import pandas as pd
+import shutil
+
+
+def shard_paths(shard_dir, chunk_num):
+    stem = os.path.join(shard_dir, f'{chunk_num:06d}')
+    return stem + '.tsv', stem + '.done'
+
+
+def chunk_params(params, df):
+    """Return params with a digest of the contents of chunk, so chunks of changed inputs are not reused."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update('\t'.join(df.columns).encode())
+    return f'{params}\t{digest.hexdigest()}'
+
+
+def is_done(shard_dir, chunk_num, params):
+    """Return True if chunk was completed by a run with identical parameters."""
+    _, marker_path = shard_paths(shard_dir, chunk_num)
+    if not os.path.exists(marker_path):
+        return False
+    with open(marker_path) as file:
+        return file.read() == params
+
+
+def write_shard(df, shard_dir, chunk_num, params):
+    """Write dataframe to shard and mark chunk as done; df is None for chunks without output rows."""
+    if not os.path.exists(shard_dir):
+        os.makedirs(shard_dir)  # Recursive folder creation
+
+    shard_path, marker_path = shard_paths(shard_dir, chunk_num)
+    if df is not None:
+        df.to_csv(shard_path + '.tmp', sep='\t')
+        os.replace(shard_path + '.tmp', shard_path)  # Prevent partially written shards from appearing complete
+    elif os.path.exists(shard_path):
+        os.remove(shard_path)  # Remove stale shard from a previous run
+    with open(marker_path, 'w') as file:
+        file.write(params)
+
+
+def shard_list(shard_dir, num_chunks):
+    """Return paths of shards with output rows in chunk order."""
+    paths = []
+    for chunk_num in range(num_chunks):
+        shard_path, _ = shard_paths(shard_dir, chunk_num)
+        if os.path.exists(shard_path):
+            paths.append(shard_path)
+    return paths
+
+
+def merge_shards(shard_dir, num_chunks, out_path, empty):
+    """Concatenate shards in chunk order into a single file with the header of the first shard.
+
+    If no chunk has output rows, only the header of the empty dataframe is written.
+    """
+    written = False
+    with open(out_path + '.tmp', 'w') as out:
+        for shard_path in shard_list(shard_dir, num_chunks):
+            with open(shard_path) as shard:
+                header = shard.readline()
+                if not written:
+                    out.write(header)
+                    written = True
+                shutil.copyfileobj(shard, out)
+        if not written:
+            empty.to_csv(out, sep='\t')
+    os.replace(out_path + '.tmp', out_path)
@@ -0,0 +1,112 @@
+"""On-disk cache of features keyed on the hash of the ungapped sequence and feature set version."""
+
+import hashlib
+import numpy as np
+import pandas as pd
+import sqlite3
+import time
+
+
+def seq_key(seq, version):
+    return hashlib.sha1(f'{version}:{seq}'.encode('ascii')).hexdigest()
+
+
+class FeatureCache:
+    """Store feature vectors in a SQLite database and evict the least recently used entries past max_size."""
+
+    def __init__(self, path, version, max_size=10000000):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS features (key TEXT PRIMARY KEY, value BLOB, used REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS features_used ON features (used)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS columns (version TEXT PRIMARY KEY, names TEXT, dtypes TEXT)')
+        self.version = str(version)
+        self.max_size = max_size  # Maximum number of entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_columns(self):
+        """Return names and dtypes of features for the current version or None if not set."""
+        row = self.conn.execute('SELECT names, dtypes FROM columns WHERE version = ?', (self.version,)).fetchone()
+        if row is None:
+            return None
+        return row[0].split('\t'), row[1].split('\t')
+
+    def set_columns(self, features):
+        names = '\t'.join(features.columns)
+        dtypes = '\t'.join(map(str, features.dtypes))
+        self.conn.execute('INSERT OR REPLACE INTO columns VALUES (?, ?, ?)', (self.version, names, dtypes))
+
+    def get(self, keys):
+        """Return dictionary of key:feature array pairs for keys in the cache and mark them as used."""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):  # Stay under SQLite's limit on query parameters
+            chunk = keys[i:i + 500]
+            query = f'SELECT key, value FROM features WHERE key IN ({", ".join("?" * len(chunk))})'
+            for key, value in self.conn.execute(query, chunk):
+                found[key] = np.frombuffer(value, dtype=np.float64)
+        now = time.time()
+        self.conn.executemany('UPDATE features SET used = ? WHERE key = ?', [(now, key) for key in found])
+        self.conn.commit()
+        return found
+
+    def put(self, keys, features):
+        """Store rows of a feature dataframe under the corresponding keys and evict entries past max_size."""
+        if self.get_columns() is None:
+            self.set_columns(features)
+        now = time.time()
+        values = features.to_numpy(dtype=np.float64)
+        self.conn.executemany('INSERT OR REPLACE INTO features VALUES (?, ?, ?)',
+                              [(key, value.tobytes(), now) for key, value in zip(keys, values)])
+
+        size = self.conn.execute('SELECT COUNT(*) FROM features').fetchone()[0]
+        if size > self.max_size:
+            self.conn.execute('DELETE FROM features WHERE key IN (SELECT key FROM features ORDER BY used LIMIT ?)',
+                              (size - self.max_size,))
+            self.evictions += size - self.max_size
+        self.conn.commit()
+
+    def report(self):
+        """Return summary of cache lookups as string."""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups > 0 else 0
+        return (f'Cache lookups: {lookups}\n'
+                f'Cache hits: {self.hits} ({rate:.1%})\n'
+                f'Cache evictions: {self.evictions}')
+
+    def close(self):
+        self.conn.close()
+
+
+def cache_lookup(seqs, cache):
+    """Return keys of sequences, dictionary of key:feature array pairs in the cache, and dictionary of key:sequence
+    pairs missing from the cache with duplicate sequences removed."""
+    keys = [seq_key(seq, cache.version) for seq in seqs]
+    found = cache.get(set(keys))
+    missing = {key: seq for key, seq in zip(keys, seqs) if key not in found}  # Also removes duplicate sequences
+    num_found = sum([key in found for key in keys])
+    cache.hits += num_found
+    cache.misses += len(keys) - num_found
+    return keys, found, missing
+
+
+def cache_merge(keys, found, missing, features, cache):
+    """Return dataframe of features for keys after adding features computed for the missing sequences to the cache."""
+    if missing:
+        cache.put(missing.keys(), features)
+        found.update(zip(missing.keys(), features.to_numpy(dtype=np.float64)))
+
+    names, dtypes = cache.get_columns()
+    values = np.array([found[key] for key in keys]).reshape(len(keys), len(names))
+    return pd.DataFrame(values, columns=names).astype(dict(zip(names, dtypes)))
+
+
+def feat_cached(seqs, cache, compute):
+    """Return dataframe of features for a list of sequences, computing only those missing from the cache.
+
+    compute is called once with the list of unique missing sequences and must return a dataframe of their features.
+    """
+    keys, found, missing = cache_lookup(seqs, cache)
+    features = compute(list(missing.values())) if missing else None
+    return cache_merge(keys, found, missing, features, cache)
@@ -1,31 +1,70 @@
 """Calculate features for all non-empty sequences"""
 
-import multiprocessing as mp
+import checkpoint
+import featcache
+import featstore
 import pandas as pd
+import pools
 import seqfeat
-from os import environ
 from sys import argv
 
 # Input variables
+argv, pool_mode, num_workers = pools.parse_argv(argv)  # Remove pool options from arguments
 path = argv[1]  # Path to segmented sequences
 type_name = argv[2]  # Name of column denoting segment type
-num_processes = int(environ['SLURM_NTASKS'])
+cache_path = argv[3] if len(argv) > 3 else None  # Optional path to feature cache
+batch_size = 1000  # Number of sequences per task
+chunk_size = 100000  # Number of segments read and written at once
+shard_dir = 'features_shards/'  # Directory of completed chunks
+feature_ext = '.tsv'  # Output format; .fstore writes a binary feature store
+profile_features = False  # Record time spent in each feature group and print a summary
 
 if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
-    # Clean data by removing gaps and empty sequences
-    segs = pd.read_csv(path, sep='\t', keep_default_na=False)
-    segs['seq'] = segs['seq'].map(lambda x: x.translate({ord('-'): None}))
-    segs_lt = segs[segs['seq'].map(lambda x: len(x) >= 1)]  # Select entries where sequence is non-empty
-
-    # Extract indices
-    seg_ids = segs_lt['seg_id']
-    types = segs_lt[type_name]
-    lengths = segs_lt['seq'].map(len).rename('length')
-
-    # Compute features
-    with mp.Pool(processes=num_processes) as pool:
-        features = pd.DataFrame(pool.imap(seqfeat.feat_all, segs_lt['seq'], chunksize=50))
-
-    # Set index and save
-    features.set_index([seg_ids, types, lengths], inplace=True)
-    features.to_csv('features.tsv', sep='\t')
+    cache = None if cache_path is None else featcache.FeatureCache(cache_path, seqfeat.feature_version)
+    chunks = pd.read_csv(path, sep='\t', keep_default_na=False, dtype={'seg_id': str}, chunksize=chunk_size)
+    params = f'{path}\t{type_name}\t{chunk_size}\t{seqfeat.feature_version}'  # Chunks are reused only if these match
+    timer = seqfeat.FeatureTimer() if profile_features else None
+    num_chunks = 0
+    with pools.Pool(pool_mode, num_workers) as pool:
+        for chunk_num, segs in enumerate(chunks):
+            num_chunks += 1
+            seg_params = checkpoint.chunk_params(params, segs)  # And the contents of the chunk
+            if checkpoint.is_done(shard_dir, chunk_num, seg_params):
+                continue
+
+            # Clean data by removing gaps and empty sequences
+            segs['seq'] = segs['seq'].map(lambda x: x.translate({ord('-'): None}))
+            segs_lt = segs[segs['seq'].map(lambda x: len(x) >= 1)]  # Select entries where sequence is non-empty
+            if len(segs_lt) == 0:
+                checkpoint.write_shard(None, shard_dir, chunk_num, seg_params)
+                continue
+
+            # Extract indices
+            seg_ids = segs_lt['seg_id']
+            types = segs_lt[type_name]
+            lengths = segs_lt['seq'].map(len).rename('length')
+
+            # Compute features
+            seqs = segs_lt['seq'].to_list()
+            if cache is None:
+                features = seqfeat.feat_pool(pool, seqs, batch_size, timer)
+            else:
+                features = featcache.feat_cached(seqs, cache, lambda x: seqfeat.feat_pool(pool, x, batch_size, timer))
+
+            # Set index and save chunk
+            features.set_index([seg_ids, types, lengths], inplace=True)
+            checkpoint.write_shard(features, shard_dir, chunk_num, seg_params)
+
+    # Merge chunks and save; the empty dataframe gives the header if every chunk is empty
+    empty = seqfeat.feat_batch([])
+    empty.index = pd.MultiIndex.from_arrays([[]] * 3, names=['seg_id', type_name, 'length'])
+    if featstore.is_store(feature_ext):
+        featstore.tsvs_to_store(checkpoint.shard_list(shard_dir, num_chunks), 'features' + feature_ext, 3, empty)
+    else:
+        checkpoint.merge_shards(shard_dir, num_chunks, 'features' + feature_ext, empty)
+
+    if cache is not None:
+        print(cache.report())
+        cache.close()
+    if timer is not None:
+        print(timer.summary().to_string())
@@ -1,18 +1,28 @@
 """Calculate features of set of shuffled sequences."""
 
-import multiprocessing as mp
+import featcache
+import featstore
 import pandas as pd
+import pools
 import seqfeat
-from os import environ, listdir
+from os import listdir
 from sys import argv
 
 # Input variables
+argv, pool_mode, num_workers = pools.parse_argv(argv)  # Remove pool options from arguments
 segment_dir = argv[1]  # Directory of segmented sequences must end in /
 type_name = argv[2]  # Name of column denoting segment type
-num_processes = int(environ['SLURM_NTASKS'])
+cache_path = argv[3] if len(argv) > 3 else None  # Optional path to feature cache
+batch_size = 1000  # Number of sequences per task
+feature_ext = '.tsv'  # Output format; .fstore writes a binary feature store
 
 if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    cache = None if cache_path is None else featcache.FeatureCache(cache_path, seqfeat.feature_version)
     paths = filter(lambda x: x.endswith('.tsv'), listdir(segment_dir))
+
+    # Load all files and queue batches of sequences to compute as a single stream of tasks
+    files = []  # File index, segment types, and subsets of each file in order of their tasks
+    tasks = []
     for path in paths:
         # Load data and subset
         segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
@@ -24,12 +34,37 @@ if __name__ == '__main__':  # Multiprocessing can only occur in top-level script
         j1 = path.find('.tsv')
         i = path[j0 + 1:j1]
 
-        # Compute features
-        with mp.Pool(processes=num_processes) as pool:
-            T_features = pd.DataFrame(pool.imap(seqfeat.feat_all, T_segs['seq'], chunksize=50))
-            F_features = pd.DataFrame(pool.imap(seqfeat.feat_all, F_segs['seq'], chunksize=50))
+        # Queue sequences of each subset which are not in the cache
+        subsets = []
+        for subset_segs in [T_segs, F_segs]:
+            seqs = subset_segs['seq'].to_list()
+            if cache is None:
+                lookup = None
+            else:
+                lookup = featcache.cache_lookup(seqs, cache)
+                seqs = list(lookup[2].values())  # Missing sequences
+            batches = seqfeat.split_batches(seqs, batch_size)
+            subsets.append((lookup, len(batches)))
+            tasks.extend(batches)
+        files.append((i, segs[type_name], subsets))
+
+    # Compute features and save each file as its tasks complete
+    with pools.Pool(pool_mode, num_workers) as pool:
+        results = pool.imap(seqfeat.feat_batch, tasks)  # Ordered, so results arrive in the order of files and subsets
+        for i, types, subsets in files:
+            subset_features = []
+            for lookup, num_batches in subsets:
+                batches = [next(results) for _ in range(num_batches)]
+                features = pd.concat(batches, ignore_index=True) if batches else None
+                if lookup is not None:
+                    features = featcache.cache_merge(*lookup, features, cache)
+                subset_features.append(features)
+
+            # Merge subsets and save
+            features = pd.concat(subset_features)
+            features.set_index(types, inplace=True)
+            featstore.write_features(features, f'features_{i}{feature_ext}')
 
-        # Merge subsets and save
-        features = pd.concat([T_features, F_features])
-        features.set_index(segs[type_name], inplace=True)
-        features.to_csv(f'features_{i}.tsv', sep='\t')
+    if cache is not None:
+        print(cache.report())
+        cache.close()
@@ -0,0 +1,70 @@
+"""Calculate summary statistics of features over replicate shuffles of sampled segments."""
+
+import numpy as np
+import os
+import pandas as pd
+import pools
+import re
+import seqfeat
+import seqshuffle
+from sys import argv
+
+
+def summarize(features):
+    """Return dataframe of summary statistics of each feature."""
+    stats = features.agg(['mean', 'var'])
+    qs = features.quantile(quantiles)
+    qs.index = [f'q{q}' for q in quantiles]
+    return pd.concat([stats, qs])
+
+
+def null_stats(seqs, seed):
+    """Return summary statistics of features of one shuffle of seqs."""
+    rng = np.random.default_rng(seed)
+    shuffled = next(seqshuffle.shuffle_seqs(seqs, rng))
+    features = [seqfeat.feat_batch(batch) for batch in seqfeat.split_batches(shuffled, batch_size)]
+    return summarize(pd.concat(features, ignore_index=True))
+
+
+# Input variables
+argv, pool_mode, num_workers = pools.parse_argv(argv)  # Remove pool options from arguments
+segment_dir = argv[1]  # Directory of sampled segments must end in /
+type_name = argv[2]  # Name of column denoting segment type
+num_replicates = int(argv[3])  # Number of shuffles of each class in each file
+seed = int(argv[4]) if len(argv) > 4 else None  # Seed for reproducible shuffles; drawn from the OS if not given
+batch_size = 1000  # Number of sequences passed to the feature engine at once
+quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+if __name__ == '__main__':  # Multiprocessing can only occur in top-level script (likely to prevent recursion)
+    seed_seq = np.random.SeedSequence(seed)
+    print('seed:', seed_seq.entropy)
+
+    paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
+    paths = sorted(paths, key=lambda x: int(x[x.find('_') + 1:x.find('.tsv')]))  # Sort so shuffles depend only on seed
+
+    # Create one task per replicate with independent seeds, so results do not depend on the order of execution
+    tasks = []
+    keys = []
+    for path in paths:
+        # Load data and subset
+        segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
+        T_seqs = segs.loc[segs[type_name], 'seq'].to_list()
+        F_seqs = segs.loc[~segs[type_name], 'seq'].to_list()
+
+        # Get file index
+        j0 = path.find('_')
+        j1 = path.find('.tsv')
+        i = path[j0 + 1:j1]
+
+        for label, seqs in [(True, T_seqs), (False, F_seqs)]:
+            for r, child_seq in enumerate(seed_seq.spawn(num_replicates)):
+                tasks.append((seqs, child_seq))
+                keys.append((i, label, r))
+
+    # Shuffle and compute features in workers, which only return summary statistics
+    with pools.Pool(pool_mode, num_workers) as pool:
+        results = pools.pool_map(pool, null_stats, tasks, num_workers, star=True)
+
+    stats = pd.concat(results, keys=keys, names=['cutoff', type_name, 'replicate', 'statistic'])
+    stats.to_csv('null_stats.tsv', sep='\t')
+
@@ -1,11 +1,61 @@
 """"Features set used in feature_calc.py."""
 
+import numpy as np
+import pandas as pd
 import re
+import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from localcider.sequenceParameters import SequenceParameters
-from math import log2
+from math import log, log2
 from Bio.SeqUtils.ProtParam import ProteinAnalysis
 
 
+# Profiling
+feature_groups = ['frac_aa', 'feat_charge', 'feat_physchem', 'feat_complexity']  # Top-level groups of feat_all
+
+
+class FeatureTimer:
+    """Accumulate time and number of calls for named feature groups.
+
+    rep_fractions and net_charge_P are timed separately within their groups, so their times are also included in the
+    times of feat_complexity and feat_charge, respectively. In feat_all, each repeat is also timed as rep_ followed by
+    its symbols. feat_batch finds all repeats in a single pass over a shared membership matrix, so it only records the
+    total for rep_fractions.
+    """
+
+    def __init__(self):
+        self.times = {}  # Name: [seconds, calls]
+
+    @contextmanager
+    def time(self, name):
+        t0 = time.perf_counter()
+        yield
+        entry = self.times.setdefault(name, [0.0, 0])
+        entry[0] += time.perf_counter() - t0
+        entry[1] += 1
+
+    def update(self, times):
+        """Add times from another timer, e.g. one returned from a worker process."""
+        for name, (seconds, calls) in times.items():
+            entry = self.times.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def summary(self):
+        """Return dataframe of calls, cumulative time, time per call, and fraction of total time of feature groups."""
+        df = pd.DataFrame.from_dict(self.times, orient='index', columns=['seconds', 'calls'])
+        df['seconds_per_call'] = df['seconds'] / df['calls']
+        df['fraction'] = df['seconds'] / df.loc[df.index.isin(feature_groups), 'seconds'].sum()
+        df.index.name = 'name'
+        return df[['calls', 'seconds', 'seconds_per_call', 'fraction']].sort_values('seconds', ascending=False)
+
+
+def timed(timer, name):
+    """Return context which records time under name if timer is not None."""
+    return nullcontext() if timer is None else timer.time(name)
+
+
 # General functions
 def remove_gaps(seq):
     return seq.translate({ord('-'): None})
@@ -87,9 +137,12 @@ def ED_ratio(seq):
     return e / d
 
 
-def feat_charge(seq):
-    SeqOb = SequenceParameters(seq)
-    return {'FCR': FCR(seq), 'NCPR': NCPR(seq), 'net_charge': net_charge(seq), 'net_charge_P': net_charge_P(seq),
+def feat_charge(seq, SeqOb=None, timer=None):
+    if SeqOb is None:
+        SeqOb = SequenceParameters(seq)
+    with timed(timer, 'net_charge_P'):
+        charge_P = net_charge_P(seq)
+    return {'FCR': FCR(seq), 'NCPR': NCPR(seq), 'net_charge': net_charge(seq), 'net_charge_P': charge_P,
             'RK_ratio': RK_ratio(seq), 'ED_ratio': ED_ratio(seq), 'kappa': SeqOb.get_kappa(), 'omega': SeqOb.get_Omega(),
             'SCD': SeqOb.get_SCD()}
 
@@ -123,8 +176,9 @@ def frac_disorder(seq):
     return frac_group(seq, 'TAGRDHQKSEP')
 
 
-def feat_physchem(seq):
-    SeqOb = SequenceParameters(seq)
+def feat_physchem(seq, SeqOb=None):
+    if SeqOb is None:
+        SeqOb = SequenceParameters(seq)
     return {'frac_acidic': frac_acidic(seq), 'frac_basic': frac_basic(seq),
             'frac_aliphatic': frac_aliphatic(seq), 'frac_chainexp': frac_chainexp(seq),
             'frac_polar': frac_polar(seq), 'frac_aromatic': frac_aromatic(seq),
@@ -134,21 +188,347 @@ def feat_physchem(seq):
 
 
 # Repeats and complexity
-def rep_fractions(seq):
-    """Return fractions of repeats as dictionary."""
+repeats = ['Q', 'N', 'S', 'G', 'E', 'D', 'K', 'R', 'P',
+           'QN', 'RG', 'FG', 'SG', 'SR', 'KAP', 'PTS']  # Groups of amino acid symbols forming repeats
+
+
+@lru_cache(maxsize=None)
+def repeat_pattern(repeat):
+    return re.compile(f'[{repeat}]{{2,}}')
+
+
+def rep_fractions(seq, repeats=repeats, timer=None):
+    """Return fractions of repeats as dictionary; if timer is given, the time of each repeat is recorded in it.
+
+    Each fraction is the fraction of the sequence in runs of length 2 or greater of the repeat's symbols. The patterns
+    are compiled once per repeat; batch_rep_fractions finds all repeats in a single pass over a batch of sequences.
+    """
     fracs = {}
-    repeats = ['Q', 'N', 'S', 'G', 'E', 'D', 'K', 'R', 'P',
-               'QN', 'RG', 'FG', 'SG', 'SR', 'KAP', 'PTS']
     for repeat in repeats:
-        fracs['rep_' + repeat] = frac_pattern(seq, f'[{repeat}]' + '{2,}')
+        with timed(timer, 'rep_' + repeat):
+            fracs['rep_' + repeat] = sum(map(len, repeat_pattern(repeat).findall(seq))) / len(seq)
     return fracs
 
 
-def feat_complexity(seq):
-    return {'wf_complexity': SequenceParameters(seq).get_linear_complexity(blobLen=len(seq))[1][0],  # Returns a 2xN matrix containing the complexity vector and the corresponding residue positions distributed equally along the sequence
-            **rep_fractions(seq)}
+def feat_complexity(seq, SeqOb=None, timer=None, repeats=repeats):
+    if SeqOb is None:
+        SeqOb = SequenceParameters(seq)
+    with timed(timer, 'rep_fractions'):
+        fracs = rep_fractions(seq, repeats, timer)
+    return {'wf_complexity': SeqOb.get_linear_complexity(blobLen=len(seq))[1][0],  # Returns a 2xN matrix containing the complexity vector and the corresponding residue positions distributed equally along the sequence
+            **fracs}
 
 
 # Summary
-def feat_all(seq):
-    return {**frac_aa(seq), **feat_charge(seq), **feat_physchem(seq), **feat_complexity(seq)}
+def feat_all(seq, timer=None, repeats=repeats):
+    """Return dictionary of all features; if timer is given, the time of each feature group is recorded in it."""
+    SeqOb = SequenceParameters(seq)  # Share a single localCIDER object across feature groups
+    with timed(timer, 'frac_aa'):
+        fracs = frac_aa(seq)
+    with timed(timer, 'feat_charge'):
+        charge = feat_charge(seq, SeqOb, timer)
+    with timed(timer, 'feat_physchem'):
+        physchem = feat_physchem(seq, SeqOb)
+    with timed(timer, 'feat_complexity'):
+        complexity = feat_complexity(seq, SeqOb, timer, repeats)
+    return {**fracs, **charge, **physchem, **complexity}
+
+
+# Batch functions
+feature_version = 1  # Increment when feature definitions change so cached features are not reused
+alphabet = 'ACDEFGHIKLMNPQRSTVWY'
+code_table = np.full(256, len(alphabet), dtype=np.uint8)  # Symbols outside the alphabet map to a shared final code
+for code, sym in enumerate(alphabet):
+    code_table[ord(sym)] = code
+
+
+def encode(seqs):
+    """Return ragged buffer of residue codes and array of lengths for a list of sequences."""
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    codes = code_table[np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)]
+    return codes, lengths
+
+
+def count_matrix(codes, lengths):
+    """Return (number of sequences x alphabet + 1) matrix of symbol counts from encoded sequences."""
+    num_syms = len(alphabet) + 1
+    seq_idx = np.repeat(np.arange(len(lengths)), lengths)
+    counts = np.bincount(seq_idx * num_syms + codes, minlength=len(lengths) * num_syms)
+    return counts.reshape(len(lengths), num_syms)
+
+
+def group_mask(group):
+    """Return boolean lookup over residue codes for a group of amino acid symbols."""
+    mask = np.zeros(len(alphabet) + 1, dtype=bool)
+    mask[[alphabet.index(sym) for sym in group]] = True
+    return mask
+
+
+def batch_count_group(counts, group):
+    return counts[:, group_mask(group)].sum(axis=1)
+
+
+def batch_rep_fractions(codes, lengths, repeats=repeats):
+    """Return (number of sequences x number of repeats) matrix of fractions of each sequence in runs of length 2 or
+    greater of each group of amino acid symbols.
+
+    All groups are found in a single pass over the encoded sequences by looking up the codes in a (groups x symbols)
+    membership matrix.
+    """
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)[:-1]
+    starts = np.zeros(len(codes), dtype=bool)
+    starts[offsets] = True
+    in_group = np.array([group_mask(repeat) for repeat in repeats]).reshape(len(repeats), -1)[:, codes]
+    linked = in_group[:, :-1] & in_group[:, 1:] & ~starts[1:]  # Residue and next residue are in the same run
+    in_run = np.zeros(in_group.shape, dtype=bool)
+    in_run[:, :-1] |= linked
+    in_run[:, 1:] |= linked
+    return (np.add.reduceat(in_run, offsets, axis=1, dtype=np.int64) / lengths).T
+
+
+def batch_count_psites(codes, lengths):
+    """Return number of [ST]P motifs in each sequence."""
+    ends = np.cumsum(lengths) - 1
+    is_psite = group_mask('ST')[codes[:-1]] & (codes[1:] == alphabet.index('P'))
+    is_psite[ends[:-1]] = False  # Exclude motifs spanning sequence boundaries
+    seq_idx = np.repeat(np.arange(len(lengths)), lengths)[:-1]
+    return np.bincount(seq_idx, weights=is_psite, minlength=len(lengths))
+
+
+# Native sequence parameters
+# Residue scales are identical to those in localCIDER; symbols outside the alphabet are neutral with undefined scales
+charge_scale = {'D': -1, 'E': -1, 'K': 1, 'R': 1}
+hydropathy_scale = {'A': 0.7, 'C': 0.7777777777777778, 'D': 0.1111111111111111, 'E': 0.1111111111111111,
+                    'F': 0.8111111111111111, 'G': 0.4555555555555555, 'H': 0.14444444444444443, 'I': 1.0,
+                    'K': 0.06666666666666668, 'L': 0.9222222222222223, 'M': 0.7111111111111111,
+                    'N': 0.1111111111111111, 'P': 0.3222222222222222, 'Q': 0.1111111111111111, 'R': 0.0,
+                    'S': 0.41111111111111115, 'T': 0.4222222222222222, 'V': 0.9666666666666666, 'W': 0.4,
+                    'Y': 0.35555555555555557}  # Kyte-Doolittle normalized to [0, 1] as in Uversky
+PPII_scale = {'A': 0.37, 'C': 0.25, 'D': 0.3, 'E': 0.42, 'F': 0.17, 'G': 0.13, 'H': 0.2, 'I': 0.39, 'K': 0.56,
+              'L': 0.24, 'M': 0.36, 'N': 0.27, 'P': 1.0, 'Q': 0.53, 'R': 0.38, 'S': 0.24, 'T': 0.32, 'V': 0.39,
+              'W': 0.25, 'Y': 0.25}  # Hilser scale
+
+
+def scale_table(scale, default):
+    """Return lookup over residue codes for a dictionary of amino acid values."""
+    table = np.full(len(alphabet) + 1, default, dtype=float)
+    for sym, value in scale.items():
+        table[alphabet.index(sym)] = value
+    return table
+
+
+charge_table = scale_table(charge_scale, 0)
+omega_table = np.where(group_mask('PEDKR'), -1.0, 1.0)  # Omega treats PEDKR and all other residues as opposite charges
+hydropathy_table = scale_table(hydropathy_scale, np.nan)
+PPII_table = scale_table(PPII_scale, np.nan)
+
+
+def delta(patterns):
+    """Return delta for each row of an array of charge patterns as the average over blobs of sizes 5 and 6."""
+    patterns = np.atleast_2d(patterns)
+    num_patterns, length = patterns.shape
+    num_pos = np.count_nonzero(patterns > 0, axis=1)
+    num_neg = np.count_nonzero(patterns < 0, axis=1)
+    FCR = (num_pos + num_neg) / length
+    sigma = np.divide(((num_pos - num_neg) / length) ** 2, FCR, out=np.zeros(num_patterns), where=FCR != 0)
+
+    cum_pos = np.zeros((num_patterns, length + 1))
+    cum_neg = np.zeros((num_patterns, length + 1))
+    np.cumsum(patterns > 0, axis=1, out=cum_pos[:, 1:])
+    np.cumsum(patterns < 0, axis=1, out=cum_neg[:, 1:])
+    deltas = []
+    for blob_len in [5, 6]:
+        num_blobs = length - blob_len + 1
+        if num_blobs <= 0:
+            deltas.append(np.zeros(num_patterns))
+            continue
+        blob_pos = cum_pos[:, blob_len:] - cum_pos[:, :-blob_len]
+        blob_neg = cum_neg[:, blob_len:] - cum_neg[:, :-blob_len]
+        blob_FCR = (blob_pos + blob_neg) / blob_len
+        blob_sigma = np.divide(((blob_pos - blob_neg) / blob_len) ** 2, blob_FCR,
+                               out=np.zeros(blob_FCR.shape), where=blob_FCR != 0)
+        deltas.append(((sigma[:, None] - blob_sigma) ** 2 / num_blobs).sum(axis=1))
+    return (deltas[0] + deltas[1]) / 2
+
+
+def block_patterns(length, fill, blocks):
+    """Return array of charge patterns filled with a value and overwritten by blocks of (starts, size, value)."""
+    idx = np.arange(length)
+    patterns = np.full((len(blocks[0][0]), length), fill, dtype=float)
+    for starts, size, value in blocks:
+        patterns[(starts[:, None] <= idx) & (idx < starts[:, None] + size)] = value
+    return patterns
+
+
+def delta_max(pattern, chunksize=256):
+    """Return maximum delta over the same set of permutations of a charge pattern searched by localCIDER."""
+    length = len(pattern)
+    num_pos = np.count_nonzero(pattern > 0)
+    num_neg = np.count_nonzero(pattern < 0)
+    num_neut = length - num_pos - num_neg
+    if num_pos + num_neg == 0:
+        return 0
+
+    if num_pos == 0 or num_neg == 0:  # Slide shorter of charged or neutral block through sequence
+        sign = 1 if num_pos > 0 else -1
+        if num_neut > num_pos + num_neg:
+            fill, size, value = 0, num_pos + num_neg, sign
+        else:
+            fill, size, value = sign, num_neut, 0
+        starts = np.arange(length - size + 1)
+        blocks = [(starts, size, value)]
+    elif num_neut == 0:  # Slide shorter of positive or negative block through sequence
+        if num_pos > num_neg:
+            fill, size, value = 1, num_neg, -1
+        else:
+            fill, size, value = -1, num_pos, 1
+        starts = np.arange(length - size + 1)
+        blocks = [(starts, size, value)]
+    else:  # Separate positive and negative blocks by neutral residues
+        if num_neut >= 18:
+            starts = [(start, num_neut - start - end) for start in range(7) for end in range(7)]
+        else:
+            starts = [(start, mid) for mid in range(num_neut + 1) for start in range(num_neut - mid + 1)]
+        starts, mids = np.array(starts).T
+        fill = 0
+        blocks = [(starts, num_pos, 1), (starts + num_pos + mids, num_neg, -1)]
+
+    dmax = 0
+    for i in range(0, len(blocks[0][0]), chunksize):
+        chunk = [(starts[i:i + chunksize], size, value) for starts, size, value in blocks]
+        dmax = max(dmax, delta(block_patterns(length, fill, chunk)).max())
+    return dmax
+
+
+def kappa(pattern):
+    """Return kappa of a charge pattern or -1 if undefined."""
+    dmax = delta_max(pattern)
+    if dmax == 0:
+        return -1
+    value = delta(pattern)[0] / dmax
+    return 1.0 if 1.0 < value < 1.1 else value  # Correct small underestimates of delta max as in localCIDER
+
+
+def SCD(pattern):
+    """Return sequence charge decoration of a charge pattern."""
+    length = len(pattern)
+    autocorr = np.correlate(pattern, pattern, mode='full')[length:]  # Sums of charge products at separations 1 to length - 1
+    return np.dot(autocorr, np.sqrt(np.arange(1, length))) / length
+
+
+def split_codes(codes, lengths):
+    return np.split(codes, np.cumsum(lengths)[:-1])
+
+
+def batch_kappa(codes, lengths):
+    return np.array([kappa(charge_table[seq_codes]) for seq_codes in split_codes(codes, lengths)])
+
+
+def batch_omega(codes, lengths):
+    return np.array([kappa(omega_table[seq_codes]) for seq_codes in split_codes(codes, lengths)])
+
+
+def batch_SCD(codes, lengths):
+    return np.array([SCD(charge_table[seq_codes]) for seq_codes in split_codes(codes, lengths)])
+
+
+def batch_mean_scale(codes, lengths, table):
+    """Return mean of a residue scale over each sequence."""
+    seq_idx = np.repeat(np.arange(len(lengths)), lengths)
+    return np.bincount(seq_idx, weights=table[codes], minlength=len(lengths)) / lengths
+
+
+def batch_wf_complexity(counts, lengths):
+    """Return Wootton-Federhen complexity of each sequence over the full sequence length."""
+    fracs = counts[:, :len(alphabet)] / lengths[:, None]
+    logs = np.log(fracs, out=np.zeros(fracs.shape), where=fracs > 0) / log(len(alphabet))
+    return -(fracs * logs).sum(axis=1)
+
+
+physchem_groups = [('acidic', 'DE'), ('basic', 'RK'), ('aliphatic', 'ALMIV'), ('chainexp', 'EDRKP'),
+                   ('polar', 'QNSTCH'), ('aromatic', 'FYW'), ('disorder', 'TAGRDHQKSEP')]
+
+
+def batch_columns(repeats=repeats):
+    """Return names of the features of feat_batch in order."""
+    return (['frac_' + sym for sym in 'SPTAHQNG'] +
+            ['FCR', 'NCPR', 'net_charge', 'net_charge_P', 'RK_ratio', 'ED_ratio', 'kappa', 'omega', 'SCD'] +
+            ['frac_' + name for name, _ in physchem_groups] + ['loglen', 'hydropathy', 'iso_point', 'PPII_prop'] +
+            ['wf_complexity'] + ['rep_' + repeat for repeat in repeats])
+
+
+def feat_batch(seqs, timer=None, repeats=repeats):
+    """Return dataframe of features equivalent to feat_all for a list of non-empty sequences.
+
+    Composition, charge, group, repeat, and length features are computed in one pass over the encoded sequences and
+    are identical to feat_all. The localCIDER features are computed natively and agree with localCIDER up to
+    floating point rounding. If timer is given, the time of each feature group is recorded in it. repeats is the list
+    of groups of amino acid symbols for the repeat features.
+    """
+    seqs = list(seqs)
+    with timed(timer, 'encode'):
+        codes, lengths = encode(seqs)
+        if len(seqs) == 0:  # Batch functions assume at least one sequence
+            return pd.DataFrame(columns=batch_columns(repeats), dtype=np.float64)
+        counts = count_matrix(codes, lengths)
+
+    features = {}
+    with timed(timer, 'frac_aa'):
+        for sym in 'SPTAHQNG':
+            features['frac_' + sym] = counts[:, alphabet.index(sym)] / lengths
+
+    with timed(timer, 'feat_charge'):
+        pos = batch_count_group(counts, 'RK')
+        neg = batch_count_group(counts, 'DE')
+        with timed(timer, 'net_charge_P'):
+            charge_P = pos - neg - 1.5 * batch_count_psites(codes, lengths)
+        features.update({'FCR': (pos + neg) / lengths, 'NCPR': (pos - neg) / lengths, 'net_charge': pos - neg,
+                         'net_charge_P': charge_P,
+                         'RK_ratio': (1 + counts[:, alphabet.index('R')]) / (1 + counts[:, alphabet.index('K')]),
+                         'ED_ratio': (1 + counts[:, alphabet.index('E')]) / (1 + counts[:, alphabet.index('D')]),
+                         'kappa': batch_kappa(codes, lengths), 'omega': batch_omega(codes, lengths),
+                         'SCD': batch_SCD(codes, lengths)})
+
+    with timed(timer, 'feat_physchem'):
+        for name, group in physchem_groups:
+            features['frac_' + name] = batch_count_group(counts, group) / lengths
+        features.update({'loglen': np.log2(lengths), 'hydropathy': batch_mean_scale(codes, lengths, hydropathy_table),
+                         'iso_point': [ProteinAnalysis(seq).isoelectric_point() for seq in seqs],
+                         'PPII_prop': batch_mean_scale(codes, lengths, PPII_table)})
+
+    with timed(timer, 'feat_complexity'):
+        features['wf_complexity'] = batch_wf_complexity(counts, lengths)
+        with timed(timer, 'rep_fractions'):
+            fracs = batch_rep_fractions(codes, lengths, repeats)
+        for repeat, frac in zip(repeats, fracs.T):
+            features['rep_' + repeat] = frac
+
+    return pd.DataFrame(features)
+
+
+def feat_batch_timed(seqs):
+    """Return dataframe of features and times of feature groups from feat_batch for use in worker processes."""
+    timer = FeatureTimer()
+    features = feat_batch(seqs, timer)
+    return features, timer.times
+
+
+def split_batches(seqs, batch_size=1000):
+    return [seqs[i:i + batch_size] for i in range(0, len(seqs), batch_size)]
+
+
+def feat_pool(pool, seqs, batch_size=1000, timer=None):
+    """Return dataframe of features for a list of sequences computed in batches with a pool.
+
+    If timer is given, the times of feature groups in the workers are added to it.
+    """
+    batches = split_batches(seqs, batch_size)
+    if timer is None:
+        return pd.concat(pool.imap(feat_batch, batches), ignore_index=True)
+
+    features = []
+    for batch_features, times in pool.imap(feat_batch_timed, batches):
+        features.append(batch_features)
+        timer.update(times)
+    return pd.concat(features, ignore_index=True)
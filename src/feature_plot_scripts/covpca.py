@@ -0,0 +1,71 @@
+"""Fit principal components of feature sets from column moments accumulated over chunks of a feature table.
+
+Each feature set is a selection of the columns of the full table which are scaled and shifted, so its covariance matrix
+is a rescaled submatrix of the covariance matrix of the table. The moments are therefore accumulated once per table,
+and the components of every feature set are found by eigendecomposition of its covariance matrix.
+"""
+
+import numpy as np
+
+
+class Moments:
+    """Count, mean, co-moment, minimum, and maximum of the columns of a matrix updated one chunk of rows at a time."""
+    def __init__(self, num_cols):
+        self.count = 0
+        self.mean = np.zeros(num_cols)
+        self.comoment = np.zeros((num_cols, num_cols))
+        self.min = np.full(num_cols, np.inf)
+        self.max = np.full(num_cols, -np.inf)
+
+    def update(self, array):
+        """Add rows of array, combining moments with the pairwise update of Chan et al. for numerical stability."""
+        count = len(array)
+        if count == 0:
+            return
+        mean = array.mean(axis=0)
+        centered = array - mean
+        delta = mean - self.mean
+        total = self.count + count
+
+        self.comoment += centered.T @ centered + np.outer(delta, delta) * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+        self.min = np.minimum(self.min, array.min(axis=0))
+        self.max = np.maximum(self.max, array.max(axis=0))
+
+    @property
+    def cov(self):
+        return self.comoment / (self.count - 1)
+
+    @property
+    def var(self):
+        return np.diag(self.cov)
+
+
+class CovPCA:
+    """PCA of a feature set given as column indices, scales, and shifts of a table, with attributes named as in sklearn."""
+    def __init__(self, n_components):
+        self.n_components = n_components
+
+    def fit(self, moments, idx, scale, shift):
+        cov = moments.cov[np.ix_(idx, idx)] * np.outer(scale, scale)  # Shifts do not change the covariance
+        eigvals, eigvecs = np.linalg.eigh(cov)
+        eigvals, eigvecs = eigvals[::-1], eigvecs[:, ::-1]  # Sort by decreasing variance
+
+        components = eigvecs[:, :self.n_components].T
+        signs = np.sign(components[np.arange(len(components)), np.argmax(np.abs(components), axis=1)])
+        self.components_ = components * signs[:, None]  # Largest loading is positive as in sklearn
+        self.explained_variance_ = eigvals[:self.n_components]
+        self.explained_variance_ratio_ = self.explained_variance_ / eigvals.sum()
+        self.idx, self.scale, self.shift = idx, scale, shift
+        self.mean_ = moments.mean[idx] * scale + shift
+        return self
+
+    def transform(self, array):
+        """Return projection of rows of the full table onto components."""
+        return (array[:, self.idx] * self.scale + self.shift - self.mean_) @ self.components_.T
+
+    def save(self, path, columns):
+        np.savez(path, columns=np.asarray(columns)[self.idx], scale=self.scale, shift=self.shift, mean=self.mean_,
+                 components=self.components_, explained_variance=self.explained_variance_,
+                 explained_variance_ratio=self.explained_variance_ratio_)
@@ -1,9 +1,8 @@
 """Plot distributions of features for two types of subsequences jointly and separately."""
 
+import featstore
 import matplotlib.pyplot as plt
 import os
-import pandas as pd
-import re
 from sys import argv
 
 # Input variables
@@ -13,14 +12,14 @@ type_name = argv[3]  # Name of column denoting segment type
 T_name = argv[4]  # Name of True type in sentence case
 F_name = argv[5]  # Name of False type in sentence case
 
-paths = filter(lambda x: re.match('features_[0-9]+\.tsv', x), os.listdir(feature_dir))
+paths = featstore.feature_paths(feature_dir)
 for path in paths:
     # Read data
-    df = pd.read_csv(feature_dir + path, sep='\t', index_col=list(range(num_idx)))
+    df = featstore.read_features(feature_dir + path, num_idx)
 
     # Get file index
     j0 = path.find('_')
-    j1 = path.find('.tsv')
+    j1 = path.find('.')
     i = int(path[j0+1:j1])
 
     # Get indices for plotting
@@ -1,12 +1,11 @@
 """Plot principal components of feature sets for two types of subsequences jointly."""
 
+import covpca
+import featstore
 import matplotlib.pyplot as plt
+import numpy as np
 import os
-import pandas as pd
-import pickle
-import re
-from shared import n_components, fsets, labels
-from sklearn.decomposition import PCA
+from shared import n_components, chunksize, fsets, labels
 from sys import argv
 
 # Input variables
@@ -16,29 +15,35 @@ type_name = argv[3]  # Name of column denoting segment type
 T_name = argv[4]  # Name of True type in sentence case
 F_name = argv[5]  # Name of False type in sentence case
 
-paths = filter(lambda x: re.match('features_[0-9]+\.tsv', x), os.listdir(feature_dir))
+paths = featstore.feature_paths(feature_dir)
 for path in paths:
-    # Load data
-    df = pd.read_csv(feature_dir + path, sep='\t', index_col=list(range(num_idx)))
+    # Accumulate moments and indices for plotting over chunks, so the full table is never loaded
+    moments, T_idx, k_idx, o_idx = None, [], [], []
+    for chunk in featstore.iter_features(feature_dir + path, num_idx, chunksize):
+        if moments is None:
+            moments, columns = covpca.Moments(chunk.shape[1]), chunk.columns
+        moments.update(chunk.to_numpy(dtype=np.float64))
+        T_idx.append(chunk.index.get_level_values(type_name).array.astype(bool))
+        k_idx.append(chunk['kappa'].to_numpy() == -1)
+        o_idx.append(chunk['omega'].to_numpy() == -1)
+    T_idx, k_idx, o_idx = np.concatenate(T_idx), np.concatenate(k_idx), np.concatenate(o_idx)
+    F_idx = ~T_idx
 
     # Get file index
     j0 = path.find('_')
-    j1 = path.find('.tsv')
+    j1 = path.find('.')
     i = path[j0+1:j1]
 
-    # Get indices for plotting
-    T_idx = df.index.get_level_values(type_name).array.astype(bool)
-    F_idx = ~T_idx
-    k_idx = df['kappa'] == -1
-    o_idx = df['omega'] == -1
-
-    for key, fset in fsets.items():
-        # Extract features
-        feat = fset(df)
+    # Calculate PCAs of all feature sets from shared moments and transform data in a second pass
+    pcas = {key: covpca.CovPCA(n_components).fit(moments, *fset(columns, moments)) for key, fset in fsets.items()}
+    transforms = {key: [] for key in pcas}
+    for chunk in featstore.iter_features(feature_dir + path, num_idx, chunksize):
+        array = chunk.to_numpy(dtype=np.float64)
+        for key, pca in pcas.items():
+            transforms[key].append(pca.transform(array)[:, :2].astype(np.float32))  # Only PC1 and PC2 are plotted
 
-        # Calculate PCA and transform data
-        pca = PCA(n_components=n_components)
-        transform = pca.fit_transform(feat.to_numpy())
+    for key, pca in pcas.items():
+        transform = np.concatenate(transforms.pop(key))
 
         # Make output directories for feature sets
         cur_dir = f'out/pca_joint/{key}/'
@@ -78,7 +83,7 @@ for path in paths:
         fig, ax = plt.subplots()
         fig.subplots_adjust(bottom=0.225)
         for cond, label in labels.items():
-            ko_idx = list(map(lambda x: x == cond, zip(k_idx, o_idx)))
+            ko_idx = (k_idx == cond[0]) & (o_idx == cond[1])
             ax.scatter(transform[ko_idx, 0], transform[ko_idx, 1], s=2, alpha=0.1, label=label)
         ax.set_title('PCA of Features\nGrouped by Kappa and Omega Values')
         ax.set_xlabel('PC1')
@@ -96,7 +101,6 @@ for path in paths:
             file.write('Principle components in feature space (truncated to the largest 5)\n')
             for component in pca.components_:
                 component = map(lambda x: round(x, 4), component)
-                pairs = sorted(list(zip(feat.columns, component)), key=lambda x: abs(x[1]), reverse=True)[:5]
+                pairs = sorted(list(zip(columns[pca.idx], component)), key=lambda x: abs(x[1]), reverse=True)[:5]
                 file.write(str(pairs) + '\n')
-        with open(cur_dir + f'model{i}.pickle', 'wb') as file:
-            pickle.dump(pca, file)
+        pca.save(cur_dir + f'model{i}.npz', columns)
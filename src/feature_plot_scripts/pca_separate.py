@@ -1,12 +1,11 @@
 """Plot principal components of feature sets for two types of subsequences separately."""
 
+import covpca
+import featstore
 import matplotlib.pyplot as plt
+import numpy as np
 import os
-import pandas as pd
-import pickle
-import re
-from shared import n_components, fsets, labels
-from sklearn.decomposition import PCA
+from shared import n_components, chunksize, fsets, labels
 from sys import argv
 
 # Input variables
@@ -16,33 +15,46 @@ type_name = argv[3]  # Name of column denoting segment type
 T_name = argv[4]  # Name of True type in sentence case
 F_name = argv[5]  # Name of False type in sentence case
 
-paths = filter(lambda x: re.match('features_[0-9]+\.tsv', x), os.listdir(feature_dir))
+paths = featstore.feature_paths(feature_dir)
 for path in paths:
-    # Read data
-    df = pd.read_csv(feature_dir + path, sep='\t', index_col=list(range(num_idx)))
+    # Accumulate moments of each type and indices for kappa and omega over chunks, so the full table is never loaded
+    moments, k_idx, o_idx = {}, {True: [], False: []}, {True: [], False: []}
+    for chunk in featstore.iter_features(feature_dir + path, num_idx, chunksize):
+        columns = chunk.columns
+        array = chunk.to_numpy(dtype=np.float64)
+        T_idx = chunk.index.get_level_values(type_name).array.astype(bool)
+        for is_T, idx in [(True, T_idx), (False, ~T_idx)]:
+            moments.setdefault(is_T, covpca.Moments(len(columns))).update(array[idx])
+            k_idx[is_T].append(chunk['kappa'].to_numpy()[idx] == -1)
+            o_idx[is_T].append(chunk['omega'].to_numpy()[idx] == -1)
 
     # Get file index
     j0 = path.find('_')
-    j1 = path.find('.tsv')
+    j1 = path.find('.')
     i = path[j0+1:j1]
 
-    # Get indices for type
-    T_idx = df.index.get_level_values(type_name).array.astype(bool)
-    F_idx = ~T_idx
+    # Calculate PCAs of all feature sets of each type from shared moments and transform subsets in a second pass
+    pcas, transforms = {}, {}
+    for is_T in [True, False]:
+        pcas[is_T] = {key: covpca.CovPCA(n_components).fit(moments[is_T], *fset(columns, moments[is_T]))
+                      for key, fset in fsets.items()}
+        transforms[is_T] = {key: [] for key in fsets}
+    for chunk in featstore.iter_features(feature_dir + path, num_idx, chunksize):
+        array = chunk.to_numpy(dtype=np.float64)
+        T_idx = chunk.index.get_level_values(type_name).array.astype(bool)
+        for is_T, idx in [(True, T_idx), (False, ~T_idx)]:
+            subset = array[idx]
+            for key, pca in pcas[is_T].items():
+                transform = pca.transform(subset)[:, :2]  # Only PC1 and PC2 are plotted
+                transforms[is_T][key].append(transform.astype(np.float32))
 
-    for idx, name, color in [(T_idx, T_name, 'C0'), (F_idx, F_name, 'C1')]:
+    for is_T, name, color in [(True, T_name, 'C0'), (False, F_name, 'C1')]:
         # Get indices for kappa and omega
-        subset = df.loc[idx]
-        k_idx = subset['kappa'] == -1
-        o_idx = subset['omega'] == -1
+        k_type_idx = np.concatenate(k_idx[is_T])
+        o_type_idx = np.concatenate(o_idx[is_T])
 
-        for key, fset in fsets.items():
-            # Extract features
-            features = fset(subset)
-
-            # Calculate PCAs and transform subsets
-            pca = PCA(n_components=n_components)
-            transform = pca.fit_transform(features.to_numpy())
+        for key, pca in pcas[is_T].items():
+            transform = np.concatenate(transforms[is_T].pop(key))
 
             # Make output directories for feature sets
             cur_dir = f'out/pca_separate/{key}/'
@@ -67,7 +79,7 @@ for path in paths:
             fig, ax = plt.subplots()
             fig.subplots_adjust(bottom=0.225)
             for cond, label in labels.items():
-                ko_idx = list(map(lambda x: x == cond, zip(k_idx, o_idx)))
+                ko_idx = (k_type_idx == cond[0]) & (o_type_idx == cond[1])
                 ax.scatter(transform[ko_idx, 0], transform[ko_idx, 1], s=2, alpha=0.1, label=label)
             ax.set_title(f'PCA of Features in {name} Subsequences\nGrouped by Kappa and Omega Values')
             ax.set_xlabel('PC1')
@@ -85,7 +97,6 @@ for path in paths:
                 file.write('Principle components in feature space (truncated to the largest 5)\n')
                 for component in pca.components_:
                     component = map(lambda x: round(x, 4), component)
-                    pairs = sorted(list(zip(features.columns, component)), key=lambda x: abs(x[1]), reverse=True)[:5]
+                    pairs = sorted(list(zip(columns[pca.idx], component)), key=lambda x: abs(x[1]), reverse=True)[:5]
                     file.write(str(pairs) + '\n')
-            with open(cur_dir + f'model{i}_{name}.pickle', 'wb') as file:
-                pickle.dump(pca, file)
+            pca.save(cur_dir + f'model{i}_{name}.npz', columns)
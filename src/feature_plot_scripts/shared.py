@@ -1,42 +1,97 @@
-"""Shared functions and parameters between all feature projection analyses."""
+"""Shared functions and parameters between all feature projection analyses.
 
+Each feature set is a selection of columns of the feature table where each column is scaled and shifted. The feature
+sets are therefore defined as functions of the column names and statistics which return the indices, scales, and
+shifts of the selected columns, so the statistics are computed once for all feature sets.
+"""
 
-def minmax(df, feats):
-    norm = df.copy()
-    for col in feats:
-        cmin = min(norm[col])
-        cmax = max(norm[col])
-        norm[col] = (norm[col] - cmin) / (cmax - cmin)
-    return norm
+import numpy as np
+import pandas as pd
 
 
-def norm(df, featnorms):
+class ColumnStats:
+    """Minimum, maximum, mean, and variance of the columns of a matrix."""
+    def __init__(self, array):
+        self.min = array.min(axis=0)
+        self.max = array.max(axis=0)
+        self.mean = array.mean(axis=0)
+        self.var = array.var(axis=0, ddof=1)
+
+
+class FeatureSet:
+    """Lazily evaluated view of a feature set as scaled and shifted columns of a matrix."""
+    def __init__(self, array, columns, idx, scale, shift):
+        self.array = array
+        self.columns = pd.Index(columns)[idx]
+        self.idx, self.scale, self.shift = idx, scale, shift
+
+    def to_numpy(self):
+        """Return feature set as a new array or the original array if it is unchanged."""
+        if len(self.idx) == self.array.shape[1] and (self.scale == 1).all() and (self.shift == 0).all():
+            return self.array
+        array = self.array[:, self.idx]  # Only copy of data; normalizations are applied in place
+        array *= self.scale
+        array += self.shift
+        return array
+
+
+def identity(columns, stats):
+    idx = np.arange(len(columns))
+    return idx, np.ones(len(idx)), np.zeros(len(idx))
+
+
+def minmax(columns, stats, feats):
+    idx, scale, shift = identity(columns, stats)
+    feat_idx = pd.Index(columns).get_indexer(feats)
+    scale[feat_idx] = 1 / (stats.max[feat_idx] - stats.min[feat_idx])
+    shift[feat_idx] = -stats.min[feat_idx] * scale[feat_idx]
+    return idx, scale, shift
+
+
+def norm(columns, stats, drops, featnorms):
+    idx, scale, shift = identity(columns, stats)
     for feat, size in featnorms:
-        df[feat] = df[feat] / size
-    return df
+        scale[pd.Index(columns).get_loc(feat)] = 1 / size
+    idx = np.flatnonzero(~pd.Index(columns).isin(drops))
+    return idx, scale[idx], shift[idx]
+
+
+def top_vars(stats, i):
+    return np.argsort(-stats.var, kind='stable')[:i]
+
+
+def drop_top_vars(columns, stats, i):
+    idx, scale, shift = identity(columns, stats)
+    idx = np.setdiff1d(idx, top_vars(stats, i))
+    return idx, scale[idx], shift[idx]
 
 
-def top_vars(df, i):
-    return df.var().sort_values(ascending=False).index[:i]
+def znorm(columns, stats):
+    idx = np.arange(len(columns))
+    scale = 1 / np.sqrt(stats.var)
+    return idx, scale, -stats.mean * scale
 
 
-def znorm(df):
-    avg = df.mean()
-    std = df.std()
-    z = (df - avg) / std
-    return z
+def fset_views(df):
+    """Yield name and lazily evaluated view of each feature set of df, computing column statistics once."""
+    array = df.to_numpy(dtype=np.float64)
+    stats = ColumnStats(array)
+    for key, fset in fsets.items():
+        yield key, FeatureSet(array, df.columns, *fset(df.columns, stats))
 
 
 n_components = 5  # number of PCA components
-fsets = {'all': lambda df: df,
-         'minmax': lambda df: minmax(df, ['net_charge', 'net_charge_P', 'ED_ratio', 'RK_ratio', 'SCD', 'loglen', 'iso_point']),
-         'norm': lambda df: norm(df.drop(['net_charge', 'net_charge_P', 'ED_ratio', 'RK_ratio', 'SCD', 'loglen', 'iso_point'], axis=1), [('NCPR', 2)]),
+chunksize = 100000  # number of rows read at once for PCA
+unbounded = ['net_charge', 'net_charge_P', 'ED_ratio', 'RK_ratio', 'SCD', 'loglen', 'iso_point']  # features not in [0, 1]
+fsets = {'all': identity,
+         'minmax': lambda columns, stats: minmax(columns, stats, unbounded),
+         'norm': lambda columns, stats: norm(columns, stats, unbounded, [('NCPR', 2)]),
          'znorm': znorm,
-         'drop_1': lambda df: df.drop(top_vars(df, 1), axis=1),
-         'drop_2': lambda df: df.drop(top_vars(df, 2), axis=1),
-         'drop_3': lambda df: df.drop(top_vars(df, 3), axis=1),
-         'drop_4': lambda df: df.drop(top_vars(df, 4), axis=1),
-         'drop_5': lambda df: df.drop(top_vars(df, 5), axis=1)}
+         'drop_1': lambda columns, stats: drop_top_vars(columns, stats, 1),
+         'drop_2': lambda columns, stats: drop_top_vars(columns, stats, 2),
+         'drop_3': lambda columns, stats: drop_top_vars(columns, stats, 3),
+         'drop_4': lambda columns, stats: drop_top_vars(columns, stats, 4),
+         'drop_5': lambda columns, stats: drop_top_vars(columns, stats, 5)}
 labels = {(True, False): 'κ = -1, Ω ≠ -1',
           (False, True): 'κ ≠ -1, Ω = -1',
           (True, True): 'κ = -1, Ω = -1',
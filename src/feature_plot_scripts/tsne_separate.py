@@ -1,11 +1,10 @@
 """Plot t-SNE of feature sets for two classes of subsequences separately."""
 
+import featstore
 import matplotlib.pyplot as plt
 import os
-import pandas as pd
 import pickle
-import re
-from shared import fsets, labels
+from shared import fset_views, labels
 from sklearn.manifold import TSNE
 from sys import argv
 
@@ -16,14 +15,14 @@ type_name = argv[3]  # Name of column denoting segment type
 T_name = argv[4]  # Name of True type in sentence case
 F_name = argv[5]  # Name of False type in sentence case
 
-paths = filter(lambda x: re.match('features_[0-9]+\.tsv', x), os.listdir(feature_dir))
+paths = featstore.feature_paths(feature_dir)
 for path in paths:
     # Read data
-    df = pd.read_csv(feature_dir + path, sep='\t', index_col=list(range(num_idx)))
+    df = featstore.read_features(feature_dir + path, num_idx)
 
     # Get file index
     j0 = path.find('_')
-    j1 = path.find('.tsv')
+    j1 = path.find('.')
     i = path[j0+1:j1]
 
     # Get indices for type
@@ -36,9 +35,9 @@ for path in paths:
         k_idx = subset['kappa'] == -1
         o_idx = subset['omega'] == -1
 
-        for key, fset in fsets.items():
+        for key, fset in fset_views(subset):
             # Extract features and initialize
-            features = fset(subset)
+            features = fset.to_numpy()
             kl_divs = []
 
             # Make output directories for feature sets
@@ -49,7 +48,7 @@ for path in paths:
             for j in [5 * 2 ** x for x in range(8)]:
                 # Calculate t-SNE and transform data
                 tsne = TSNE(n_components=2, perplexity=j)
-                transform = tsne.fit_transform(features.to_numpy())
+                transform = tsne.fit_transform(features)
                 kl_divs.append((j, tsne.kl_divergence_))
 
                 # Plot t-SNEs
@@ -1,9 +1,9 @@
 """Create pie chart of contribution to overall variance of each feature."""
 
+import featstore
 import os
 import matplotlib.pyplot as plt
 import pandas as pd
-import re
 from matplotlib import cm
 from sys import argv
 
@@ -25,14 +25,14 @@ type_name = argv[3]  # Name of column denoting segment type
 T_name = argv[4]  # Name of True type in sentence case
 F_name = argv[5]  # Name of False type in sentence case
 
-paths = filter(lambda x: re.match('features_[0-9]+\.tsv', x), os.listdir(feature_dir))
+paths = featstore.feature_paths(feature_dir)
 for path in paths:
     # Read data
-    features = pd.read_csv(feature_dir + path, sep='\t', index_col=list(range(num_idx)))
+    features = featstore.read_features(feature_dir + path, num_idx)
 
     # Get file index
     j0 = path.find('_')
-    j1 = path.find('.tsv')
+    j1 = path.find('.')
     i = path[j0 + 1:j1]
 
     # Split into segment types
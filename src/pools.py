@@ -0,0 +1,137 @@
+"""Create worker pools sized from the command line, environment, or CPU quota.
+
+Pools are configured with the options --workers=N and --pool=MODE, where MODE is process, thread, or serial. If an option
+is absent, the environment variables NUM_WORKERS (falling back to SLURM_NTASKS) and POOL_MODE are used. Otherwise the
+number of workers is the number of CPUs available to the process after accounting for affinity and cgroup quotas.
+"""
+
+import math
+import multiprocessing as mp
+import os
+import time
+from itertools import starmap
+from multiprocessing.pool import ThreadPool
+
+pool_modes = ['process', 'thread', 'serial']
+
+
+def cgroup_cpus():
+    """Return CPU limit from cgroup quota or None if unlimited."""
+    try:  # cgroup v2
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as file:
+            quota = int(file.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as file:
+            period = int(file.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_count():
+    """Return number of CPUs available to the process."""
+    try:
+        num_cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on all platforms
+        num_cpus = os.cpu_count() or 1
+    quota = cgroup_cpus()
+    if quota is not None:
+        num_cpus = min(num_cpus, max(1, math.floor(quota)))
+    return num_cpus
+
+
+def parse_argv(argv):
+    """Return arguments without pool options, pool mode, and number of workers."""
+    args, mode, num_workers = [], None, None
+    for arg in argv:
+        if arg.startswith('--workers='):
+            num_workers = int(arg[len('--workers='):])
+        elif arg.startswith('--pool='):
+            mode = arg[len('--pool='):]
+        else:
+            args.append(arg)
+
+    if mode is None:
+        mode = os.environ.get('POOL_MODE', 'process')
+    if mode not in pool_modes:
+        raise ValueError(f'Pool mode {mode} is not one of {", ".join(pool_modes)}')
+    if num_workers is None:
+        env_workers = os.environ.get('NUM_WORKERS', os.environ.get('SLURM_NTASKS'))
+        num_workers = cpu_count() if env_workers is None else int(env_workers)
+    if mode == 'serial':
+        num_workers = 1
+    return args, mode, max(1, num_workers)
+
+
+class SerialPool:
+    """Pool with the interface of multiprocessing.Pool which runs all tasks in the calling process."""
+
+    def map(self, func, iterable, chunksize=None):
+        return list(map(func, iterable))
+
+    def imap(self, func, iterable, chunksize=1):
+        return map(func, iterable)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        return map(func, iterable)
+
+    def starmap(self, func, iterable, chunksize=None):
+        return list(starmap(func, iterable))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+def Pool(mode, num_workers):
+    """Return pool of the given mode with num_workers workers."""
+    if mode == 'serial':
+        return SerialPool()
+    if mode == 'thread':
+        return ThreadPool(processes=num_workers)
+    return mp.Pool(processes=num_workers)
+
+
+def chunk_size(num_tasks, num_workers, task_time=None, target_time=0.1):
+    """Return number of tasks sent to a worker at once.
+
+    Without an estimate of the time per task, this is the default of Pool.map, which gives each worker four chunks.
+    Otherwise chunks are sized to take about target_time seconds, so cheap tasks are not dominated by the overhead of
+    passing them to workers, but never larger than the default, so costly tasks are still balanced between workers.
+    """
+    default = max(1, math.ceil(num_tasks / (4 * num_workers)))
+    if task_time is None:
+        return default
+    return max(1, min(default, round(target_time / max(task_time, 1E-9))))
+
+
+def pool_map(pool, func, tasks, num_workers, star=False):
+    """Return list of results of func applied to tasks with chunk size chosen from the time of the first task.
+
+    The first task is run in the calling process to estimate the cost of a task. If star is True, each task is unpacked
+    into the arguments of func as in Pool.starmap.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+
+    t0 = time.perf_counter()
+    first = func(*tasks[0]) if star else func(tasks[0])
+    task_time = time.perf_counter() - t0
+
+    chunksize = chunk_size(len(tasks) - 1, num_workers, task_time)
+    if star:
+        rest = pool.starmap(func, tasks[1:], chunksize=chunksize)
+    else:
+        rest = pool.map(func, tasks[1:], chunksize=chunksize)
+    return [first] + rest
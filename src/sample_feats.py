@@ -1,5 +1,6 @@
 """Extract features corresponding to sampled segments."""
 
+import featstore
 import os
 import pandas as pd
 import re
@@ -11,9 +12,11 @@ type_name = argv[2]  # Name of column denoting segment type
 
 # Constants
 segment_dir = '../sample_segs/'
-features_path = '../feature_calc/features.tsv'
+features_path = featstore.find_features('../feature_calc/features')  # Feature store if present, otherwise TSV
+features_ext = os.path.splitext(features_path)[1]  # Samples are written in the same format
 
-features = pd.read_csv(features_path, sep='\t', index_col=list(range(num_idx)))
+# Stores are read by key for each sample, while TSVs are read once
+features = features_path if featstore.is_store(features_path) else featstore.read_features(features_path, num_idx)
 
 paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
 for path in paths:
@@ -26,8 +29,6 @@ for path in paths:
     i = path[j0 + 1:j1]
 
     # Extract features and save
-    num_id = features.index.names.index('seg_id')
-    idx = tuple([slice(None) if i != num_id else segs['seg_id'] for i in range(num_idx)])
-
-    sample = features.loc[idx, :].sort_index(level=[type_name, 'seg_id'], ascending=[False, True])
-    sample.to_csv(f'features_{i}.tsv', sep='\t')
+    sample = featstore.read_keys(features, num_idx, 'seg_id', segs['seg_id'])
+    sample = sample.sort_index(level=[type_name, 'seg_id'], ascending=[False, True])
+    featstore.write_features(sample, f'features_{i}{features_ext}')
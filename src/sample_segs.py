@@ -1,27 +1,63 @@
 """Create samples sequences at different cutoffs."""
 
+import numpy as np
 import pandas as pd
 from sys import argv
 
+
+def sample_class(idx, lengths, rng):
+    """Return dictionary of cutoff: sampled row indices for the rows in idx.
+
+    Rows are sorted by length once, so the rows eligible at each cutoff are a suffix of the sorted rows. If nested is
+    True, each row is assigned a single random key and the n eligible rows with the smallest keys are drawn at each
+    cutoff, so samples at larger cutoffs reuse all eligible rows drawn at smaller cutoffs.
+    """
+    order = idx[np.argsort(lengths[idx], kind='stable')]
+    sorted_lengths = lengths[order]
+    keys = rng.random(len(order)) if nested else None
+
+    samples = {}
+    for cutoff in cutoffs:
+        start = np.searchsorted(sorted_lengths, cutoff, side='left')
+        eligible = order[start:]
+        if len(eligible) < n:
+            raise ValueError(f'Cannot sample {n} segments at cutoff {cutoff} from {len(eligible)} eligible segments')
+        if nested:
+            samples[cutoff] = eligible[np.argpartition(keys[start:], n - 1)[:n]] if len(eligible) > n else eligible
+        else:
+            samples[cutoff] = rng.choice(eligible, n, replace=False)
+    return samples
+
+
 # Input variables
 path = argv[1]
 type_name = argv[2]  # Name of column denoting segment type
+n = int(argv[3]) if len(argv) > 3 else 8500  # Number of segments sampled from each class
+seed = int(argv[4]) if len(argv) > 4 else None  # Seed for reproducible samples; drawn from the OS if not given
 
 # Constants
-n = 8500
+cutoffs = [2 ** x for x in range(6)]
+nested = False  # Draw samples at larger cutoffs from the same random ordering as smaller cutoffs
+
+seed_seq = np.random.SeedSequence(seed)
+rng = np.random.default_rng(seed_seq)
+print('seed:', seed_seq.entropy)
 
+# Read data and compute ungapped lengths once
 segs = pd.read_csv(path, sep='\t', keep_default_na=False)
-segs['seq'] = segs['seq'].map(lambda x: x.translate({ord('-'): None}))  # Remove gaps if present
-for i in [2 ** x for x in range(6)]:
-    # Read data and split segments
-    segs_lt = segs[segs['seq'].map(lambda x: len(x) >= i)]
-    T_segs = segs_lt[segs_lt[type_name]]
-    F_segs = segs_lt[~segs_lt[type_name]]
+lengths = (segs['seq'].str.len() - segs['seq'].str.count('-')).to_numpy()
+types = segs[type_name].to_numpy(dtype=bool)
+
+# Sample all cutoffs for each class
+T_samples = sample_class(np.flatnonzero(types), lengths, rng)
+F_samples = sample_class(np.flatnonzero(~types), lengths, rng)
 
+for i in cutoffs:
     # Sample segments
-    T_sample = T_segs.sample(n).sort_values('seg_id')
-    F_sample = F_segs.sample(n).sort_values('seg_id')
+    T_sample = segs.iloc[T_samples[i]].sort_values('seg_id')
+    F_sample = segs.iloc[F_samples[i]].sort_values('seg_id')
 
-    # Merge samples and save
+    # Merge samples, remove gaps if present, and save
     sample = pd.concat([T_sample, F_sample])
+    sample['seq'] = sample['seq'].map(lambda x: x.translate({ord('-'): None}))
     sample.to_csv(f'segments_{i}.tsv', sep='\t', index=False)
@@ -3,13 +3,20 @@
 import os
 import pandas as pd
 import re
-from itertools import accumulate
-from random import shuffle
+import seqshuffle
 from sys import argv
 
+# Input variables
 segment_dir = argv[1]  # Segment directory must end in /
 type_name = argv[2]  # Name of column denoting segment type
+num_replicates = int(argv[3]) if len(argv) > 3 else 1  # Number of independent shuffles of each file
+seed = int(argv[4]) if len(argv) > 4 else None  # Seed for reproducible shuffles; drawn from the OS if not given
+
+rng, seed = seqshuffle.make_rng(seed)
+print('seed:', seed)
+
 paths = filter(lambda x: re.match('segments_[0-9]+\.tsv', x), os.listdir(segment_dir))
+paths = sorted(paths, key=lambda x: int(x[x.find('_') + 1:x.find('.tsv')]))  # Sort so shuffles depend only on seed
 for path in paths:
     # Load data and split into subsets
     segs = pd.read_csv(segment_dir + path, sep='\t', keep_default_na=False)
@@ -21,22 +28,15 @@ for path in paths:
     j1 = path.find('.tsv')
     i = path[j0+1:j1]
 
-    # Create list of symbols and shuffle in place
-    T_symlist = [sym for seq in T_seqs for sym in seq]
-    F_symlist = [sym for seq in F_seqs for sym in seq]
-    shuffle(T_symlist)
-    shuffle(F_symlist)
-
-    # Create splice indices
-    T_lens = [len(seq) for seq in T_seqs]
-    F_lens = [len(seq) for seq in F_seqs]
-    T_accum = accumulate(T_lens)
-    F_accum = accumulate(F_lens)
-
-    # Slice shuffled lists
-    shuffseq_T = [''.join(T_symlist[accum - size:accum]) for accum, size in zip(T_accum, T_lens)]
-    shuffseq_F = [''.join(F_symlist[accum - size:accum]) for accum, size in zip(F_accum, F_lens)]
-
-    # Convert to dataframe and save
-    shuffseq = pd.DataFrame({type_name: segs[type_name], 'seq': shuffseq_T + shuffseq_F})
-    shuffseq.to_csv(f'shuffseq_{i}.tsv', sep='\t', index=False)
+    # Shuffle residues within each subset
+    T_replicates = seqshuffle.shuffle_seqs(T_seqs, rng, num_replicates)
+    F_replicates = seqshuffle.shuffle_seqs(F_seqs, rng, num_replicates)
+
+    # Convert to dataframe and save; replicates are saved in separate directories
+    for r, (shuffseq_T, shuffseq_F) in enumerate(zip(T_replicates, F_replicates)):
+        out_dir = '' if num_replicates == 1 else f'replicate_{r}/'
+        if out_dir and not os.path.exists(out_dir):
+            os.mkdir(out_dir)
+
+        shuffseq = pd.DataFrame({type_name: segs[type_name], 'seq': shuffseq_T + shuffseq_F})
+        shuffseq.to_csv(f'{out_dir}shuffseq_{i}.tsv', sep='\t', index=False)
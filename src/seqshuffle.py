@@ -0,0 +1,24 @@
+"""Shuffle residues across a set of sequences while preserving their lengths and total composition."""
+
+import numpy as np
+
+
+def make_rng(seed=None):
+    """Return random generator and the seed used to create it; a seed is drawn from the OS if None."""
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    return np.random.default_rng(seed), seed
+
+
+def shuffle_seqs(seqs, rng, num_replicates=1):
+    """Yield lists of sequences where the residues of seqs are permuted across all sequences.
+
+    The sequences are concatenated into a single byte buffer which is permuted once per replicate and split at the
+    cumulative lengths, so each replicate has the same length distribution and composition as seqs.
+    """
+    seqs = list(seqs)
+    buffer = np.frombuffer(''.join(seqs).encode('ascii'), dtype=np.uint8)
+    offsets = np.concatenate([[0], np.cumsum([len(seq) for seq in seqs])]).tolist()
+    for _ in range(num_replicates):
+        shuffled = rng.permutation(buffer).tobytes().decode('ascii')
+        yield [shuffled[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]